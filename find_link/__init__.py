@@ -6,6 +6,17 @@ from flask import Flask, request
 
 import find_link.view
 
+from . import (
+    api,
+    cache,
+    content_store,
+    language,
+    parse_cache,
+    ratelimit,
+    redirect_cache,
+    suggest,
+    timeouts,
+)
 from .error_mail import setup_error_mail
 
 ExcInfo = (
@@ -52,6 +63,15 @@ def create_app() -> MyFlask:
     """Create application."""
     app = MyFlask(__name__)
     app.config.from_pyfile("config")
+    language.init_app(app)
+    timeouts.init_app(app)
     find_link.view.init_app(app)
+    api.init_app(app)
+    ratelimit.init_app(app)
+    cache.init_app(app)
+    content_store.init_app(app)
+    parse_cache.init_app(app)
+    redirect_cache.init_app(app)
+    suggest.init_app(app)
     setup_error_mail(app)
     return app
@@ -0,0 +1,207 @@
+"""Asyncio client for the Wikipedia API.
+
+Async versions of the functions in find_link.api, they raise the same
+exceptions. Only the I/O is async, the request parameters and the parsing of
+replies come from find_link.api. A client holds one pool of connections and
+limits the number of requests in flight to each Wikipedia host.
+
+aiohttp is an optional dependency, only needed for this module.
+"""
+
+import asyncio
+import time
+import typing
+from typing import Any
+
+import aiohttp
+
+from . import api, ratelimit
+from .api import decode_reply, ua
+from .cache import get_response_cache
+from .language import get_current_language
+
+default_params: dict[str, str | int] = {
+    "format": "json",
+    "action": "query",
+    "formatversion": 2,
+}
+
+
+def encode_params(params: dict[str, Any]) -> dict[str, str]:
+    """Convert parameter values to strings, aiohttp won't take ints."""
+    return {k: str(v) for k, v in {**default_params, **params}.items()}
+
+
+class Client:
+    """Wikipedia API client using a pool of aiohttp connections.
+
+    Use as an async context manager, or call close() when finished.
+    """
+
+    def __init__(
+        self,
+        per_host: int = 8,
+        total: int = 100,
+        url_template: str = "https://{lang}.wikipedia.org/w/api.php",
+    ) -> None:
+        """Init."""
+        self.per_host = per_host
+        self.total = total
+        self.url_template = url_template
+        self.session: aiohttp.ClientSession | None = None
+        self.host_limits: dict[str, asyncio.Semaphore] = {}
+
+    async def __aenter__(self) -> "Client":
+        """Open the connection pool."""
+        self.get_session()
+        return self
+
+    async def __aexit__(self, *exc: typing.Any) -> None:
+        """Close the connection pool."""
+        await self.close()
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """Get the aiohttp session, creating it if needed."""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.total, limit_per_host=self.per_host
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector, headers={"User-Agent": ua}
+            )
+        return self.session
+
+    async def close(self) -> None:
+        """Close all connections."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def query_url(self) -> str:
+        """Get the wikipedia query API for the current language."""
+        return self.url_template.format(lang=get_current_language())
+
+    def host_limit(self, url: str) -> asyncio.Semaphore:
+        """Semaphore that limits concurrent requests to one host."""
+        if url not in self.host_limits:
+            self.host_limits[url] = asyncio.Semaphore(self.per_host)
+        return self.host_limits[url]
+
+    async def request(
+        self, method: str, params: dict[str, Any] | None = None, data: Any = None
+    ) -> dict[str, Any]:
+        """Send request to the API and decode the reply."""
+        url = self.query_url()
+        session = self.get_session()
+        limiter = ratelimit.get_limiter(get_current_language())
+        async with self.host_limit(url):
+            for attempt in range(ratelimit.throttle_retries + 1):
+                while wait := limiter.try_acquire():
+                    await asyncio.sleep(wait)
+                start = time.monotonic()
+                try:
+                    async with session.request(
+                        method, url, params=params, data=data
+                    ) as r:
+                        text = await r.text()
+                except BaseException:
+                    limiter.release(time.monotonic() - start, "error")
+                    raise
+                latency = time.monotonic() - start
+                if ratelimit.is_throttled(r.status, r.headers):
+                    retry_after = ratelimit.parse_retry_after(
+                        r.headers.get("Retry-After")
+                    )
+                    limiter.release(latency, "throttled", retry_after)
+                    continue
+                limiter.release(latency, "error" if r.status >= 500 else "ok")
+                break
+        return decode_reply(text)
+
+    async def api_get(self, params: dict[str, Any]) -> dict[str, Any]:
+        """Make call to Wikipedia API."""
+        cache = get_response_cache()
+        if cache:
+            cached = cache.get(get_current_language(), params)
+            if cached is not None:
+                return cached
+        ret = await self.request("GET", params=encode_params(params))
+        if cache:
+            cache.set(get_current_language(), params, ret)
+        return ret
+
+    async def get_first_page(self, params: dict[str, str]) -> dict[str, Any]:
+        """Run Wikipedia API query and return the first page."""
+        return api.first_page(await self.api_get(params))
+
+    async def wiki_search(self, q: str) -> tuple[int, list[dict[str, Any]]]:
+        """Run search on Wikipedia."""
+        params = {**api.search_params(q), "continue": ""}
+        ret = await self.api_get(params)
+        query = ret["query"]
+        totalhits = query["searchinfo"]["totalhits"]
+        results = query["search"]
+        for _ in range(10):
+            if "continue" not in ret:
+                break
+            params["sroffset"] = ret["continue"]["sroffset"]
+            ret = await self.api_get(params)
+            results += ret["query"]["search"]
+        return (totalhits, results)
+
+    async def get_wiki_info(self, q: str) -> str | None:
+        """Get destination of redirect."""
+        ret = await self.api_get(api.redirect_params(q))
+        return api.redirect_target(q, api.parse_redirect(ret["query"]))
+
+    async def wiki_backlink(self, q: str) -> tuple[set[str], set[str]]:
+        """Get backlinks for article."""
+        params = {**api.backlink_params(q), "continue": ""}
+        ret = await self.api_get(params)
+        docs = ret["query"]["backlinks"]
+        while "continue" in ret:
+            params.update(ret["continue"])
+            ret = await self.api_get(params)
+            docs += ret["query"]["backlinks"]
+        return api.split_backlinks(docs)
+
+    async def find_disambig(self, titles: list[str]) -> list[str]:
+        """Find disambiguation articles in the given list of titles.
+
+        Batches of 50 titles are looked up concurrently.
+        """
+        titles = list(titles)
+        assert titles
+
+        async def check_batch(batch: list[str]) -> list[str]:
+            params = api.disambig_params(batch)
+            ret = await self.api_get(params)
+            found = api.disambig_titles(ret)
+            for i in range(10):
+                if "continue" not in ret:
+                    break
+                params["tlcontinue"] = ret["continue"]["tlcontinue"]
+                ret = await self.api_get(params)
+                found += api.disambig_titles(ret)
+            return found
+
+        batches = [titles[pos : pos + 50] for pos in range(0, len(titles), 50)]
+        results = await asyncio.gather(*(check_batch(b) for b in batches))
+        return [title for found in results for title in found]
+
+    async def categorymembers(self, q: str) -> list[str]:
+        """List of category members."""
+        ret = await self.api_get(api.categorymembers_params(q))
+        return api.other_titles(ret["query"]["categorymembers"], q)
+
+    async def all_pages(self, q: str) -> list[str]:
+        """Get all article titles with a given prefix."""
+        ret = await self.api_get(api.all_pages_params(q))
+        return api.other_titles(ret["query"]["allpages"], q)
+
+    async def call_get_diff(
+        self, title: str, section_num: int, section_text: str
+    ) -> str:
+        """Get edit diff."""
+        data = api.diff_params(title, section_num, section_text)
+        return api.diff_body(await self.request("POST", data=encode_params(data)))
@@ -1,13 +1,30 @@
 import collections
+import concurrent.futures
+import contextvars
+import json
 import re
+import threading
+import time
 import typing
+import urllib.parse
 from typing import Any
 
+import flask
 import requests
 from requests.adapters import HTTPAdapter
-from simplejson.scanner import JSONDecodeError
+from urllib3.util.retry import Retry
 
+from . import ratelimit, redirect_cache, singleflight
+from .cache import get_response_cache, make_key
 from .language import get_current_language
+from .redirect_cache import RedirectEntry
+from .timeouts import (
+    CircuitBreaker,
+    call_timeout,
+    default_timeout,
+    get_breaker,
+    remaining,
+)
 from .util import is_disambig
 
 ua = (
@@ -16,26 +33,108 @@ ua = (
 )
 re_disambig = re.compile(r"^(.*) \((.*)\)$")
 
+# Upper limit on concurrent API calls when fetching pages in parallel.
+paging_workers = 8
+
 
-def get_query_url() -> str:
-    """Get the wikipedia query API for the current language."""
-    return f"https://{get_current_language()}.wikipedia.org/w/api.php"
+def get_query_url(lang: str | None = None) -> str:
+    """Get the wikipedia query API for the given or current language."""
+    return f"https://{lang or get_current_language()}.wikipedia.org/w/api.php"
 
 
 sessions: dict[str, requests.Session] = {}
+sessions_lock = threading.Lock()
 
 CallParams = dict[str, str | int]
 
-
-def get_session() -> requests.Session:
-    """Get requests.Session for the current language."""
-    lang = get_current_language()
-    if lang in sessions:
-        assert sessions[lang]
-        return sessions[lang]
+# Connection pool and retry settings, used for every language.
+session_config: dict[str, typing.Any] = {
+    "pool_size": 20,  # connections kept open to each host
+    "keep_alive": True,
+    "retries": 3,
+    "backoff_factor": 0.3,
+    "retry_statuses": (502, 504),  # 429 and 503 are left to the rate limiter
+}
+
+
+def configure_sessions(**config: typing.Any) -> None:
+    """Change connection settings, existing sessions are closed."""
+    unknown = set(config) - set(session_config)
+    assert not unknown, f"unknown session settings: {unknown}"
+    with sessions_lock:
+        session_config.update(config)
+        for s in sessions.values():
+            s.close()
+        sessions.clear()
+
+
+def init_app(app: flask.Flask) -> None:
+    """Configure connections from the app config."""
+    names = {
+        "API_POOL_SIZE": "pool_size",
+        "API_KEEP_ALIVE": "keep_alive",
+        "API_RETRIES": "retries",
+        "API_BACKOFF_FACTOR": "backoff_factor",
+    }
+    config = {name: app.config[key] for key, name in names.items() if key in app.config}
+    if config:
+        configure_sessions(**config)
+    singleflight.configure_lock_dir(app.config.get("SINGLEFLIGHT_LOCK_DIR"))
+
+
+class DeadlineRetry(Retry):
+    """Retry, except when the request has a deadline or the budget is used up.
+
+    urllib3 retries inside a single call and sleeps for the backoff and any
+    Retry-After header, the per-call timeout doesn't limit the total time.
+    With a deadline the error or reply goes straight back to send, which
+    knows how much time is left. Each retry is a request, it is counted
+    against the request budget like the ones send makes.
+    """
+
+    def increment(self, *args: typing.Any, **kwargs: typing.Any) -> "DeadlineRetry":
+        """Count a retry, or give up if there is a deadline or no budget."""
+        if remaining() is None:
+            retry = super().increment(*args, **kwargs)  # raises when out of retries
+            if spend_on_retry(*args, **kwargs):
+                return retry
+        return Retry.increment(self.new(total=False), *args, **kwargs)
+
+
+def spend_on_retry(
+    method: str | None = None, url: str | None = None, **kwargs: typing.Any
+) -> bool:
+    """Count a retry against the request budget, False if it is used up."""
+    budget = ratelimit.request_budget
+    if budget is None:
+        return True
+    # urllib3 passes the connection pool and a path, others pass a full URL
+    pool = kwargs.get("_pool")
+    host = getattr(pool, "host", None) or urllib.parse.urlsplit(url or "").hostname
+    lang = (host or "").partition(".")[0]
+    return budget.spend(lang)
+
+
+def new_session(lang: str) -> requests.Session:
+    """Create session with a retrying connection pool for a language."""
     s = requests.Session()
     s.headers.update({"User-Agent": ua})
-    s.mount("https://en.wikipedia.org", HTTPAdapter(max_retries=10))
+    if not session_config["keep_alive"]:
+        s.headers["Connection"] = "close"
+    retry = DeadlineRetry(
+        total=session_config["retries"],
+        backoff_factor=session_config["backoff_factor"],
+        status_forcelist=session_config["retry_statuses"],
+        allowed_methods=None,  # API calls are read only, POST is safe to retry
+        raise_on_status=False,
+        respect_retry_after_header=False,  # 429 and 503 go to the rate limiter
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=session_config["pool_size"],
+        max_retries=retry,
+    )
+    s.mount(f"https://{lang}.wikipedia.org", adapter)
     s.params = typing.cast(
         CallParams,
         {
@@ -44,14 +143,46 @@ def get_session() -> requests.Session:
             "formatversion": 2,
         },
     )
-    sessions[lang] = s
     return s
 
 
+def get_session(lang: str | None = None) -> requests.Session:
+    """Get requests.Session for the given or current language.
+
+    One session per language is shared by every thread. Sessions aren't
+    per-thread because the worker threads used by do_search are short-lived,
+    they would lose the kept-alive connections.
+    """
+    lang = lang or get_current_language()
+    s = sessions.get(lang)
+    if s:
+        return s
+    with sessions_lock:
+        if lang not in sessions:
+            sessions[lang] = new_session(lang)
+        return sessions[lang]
+
+
 class MediawikiError(Exception):
     """Mediawiki error."""
 
 
+class DeadlineExceeded(MediawikiError):
+    """No time left to make another API call for this request."""
+
+
+class HostUnavailable(MediawikiError):
+    """Wikipedia host isn't responding, or its circuit breaker is open."""
+
+
+class BudgetExhausted(HostUnavailable):
+    """The request budget for this host has been used up."""
+
+
+# identical API calls made at the same time share a single HTTP request
+in_flight = singleflight.Group(retry_on=(DeadlineExceeded,))
+
+
 class MultipleRedirects(Exception):
     """Multiple redirects."""
 
@@ -75,15 +206,12 @@ webpage_error = (
 )
 
 
-def api_get(params: dict[str, typing.Any]) -> dict[str, Any]:
-    """Make call to Wikipedia API."""
-    s = get_session()
-
-    r = s.get(get_query_url(), params=params)
+def decode_reply(text: str) -> dict[str, Any]:
+    """Parse JSON from the API and check it for errors."""
     try:
-        ret: dict[str, typing.Any] = r.json()
-    except JSONDecodeError:
-        if webpage_error in r.text:
+        ret: dict[str, typing.Any] = json.loads(text)
+    except ValueError:
+        if webpage_error in text:
             raise MediawikiError(webpage_error)
         else:
             raise MediawikiError("unknown error")
@@ -91,15 +219,131 @@ def api_get(params: dict[str, typing.Any]) -> dict[str, Any]:
     return ret
 
 
-def get_first_page(params: dict[str, str]) -> dict[str, typing.Any]:
+def send(method: str, lang: str, **kwargs: typing.Any) -> requests.Response:
+    """Send HTTP request to the API with a timeout and circuit breaker.
+
+    Requests wait for the rate limiter, when Wikipedia replies with a maxlag
+    error or 429/503 the limiter backs off and the request is tried again.
+    """
+    budget = ratelimit.request_budget
+    if budget is not None and not budget.available(lang):
+        raise BudgetExhausted(f"{lang}.wikipedia.org: request budget used up")
+    breaker = get_breaker(lang)
+    if not breaker.allow():
+        raise HostUnavailable(f"{lang}.wikipedia.org is not responding")
+    try:
+        return send_allowed(breaker, method, lang, **kwargs)
+    finally:
+        # a half-open trial that ended without an outcome lets the next one in
+        breaker.release_trial()
+
+
+def send_allowed(
+    breaker: CircuitBreaker, method: str, lang: str, **kwargs: typing.Any
+) -> requests.Response:
+    """Send a request the circuit breaker has let through."""
+    if ratelimit.maxlag is not None:
+        field = "params" if method == "GET" else "data"
+        kwargs[field] = {**kwargs.get(field, {}), "maxlag": ratelimit.maxlag}
+
+    limiter = ratelimit.get_limiter(lang)
+    s = get_session(lang)
+    for attempt in range(ratelimit.throttle_retries + 1):
+        budget = ratelimit.request_budget
+        if budget is not None and not budget.spend(lang):
+            raise BudgetExhausted(f"{lang}.wikipedia.org: request budget used up")
+        left = remaining()
+        if not limiter.acquire(ratelimit.max_queue_wait if left is None else left):
+            if call_timeout() is None:
+                raise DeadlineExceeded("out of time for this request")
+            raise HostUnavailable(f"{lang}.wikipedia.org: rate limited")
+        timeout = call_timeout()
+        if timeout is None:
+            limiter.release(0, "cancelled")
+            raise DeadlineExceeded("out of time for this request")
+
+        start = time.monotonic()
+        try:
+            r = s.request(method, get_query_url(lang), timeout=timeout, **kwargs)
+        except requests.RequestException as e:
+            limiter.release(time.monotonic() - start, "error")
+            # timing out early because the deadline is near says nothing
+            # about the host, it shouldn't open the breaker for everybody
+            if not (isinstance(e, requests.Timeout) and timeout != default_timeout):
+                breaker.record_failure()
+            if call_timeout() is None:
+                raise DeadlineExceeded("out of time for this request") from e
+            raise HostUnavailable(f"{lang}.wikipedia.org: {e}") from e
+        latency = time.monotonic() - start
+
+        if ratelimit.is_throttled(r.status_code, r.headers):
+            retry_after = ratelimit.parse_retry_after(r.headers.get("Retry-After"))
+            limiter.release(latency, "throttled", retry_after)
+            continue
+        limiter.release(latency, "error" if r.status_code >= 500 else "ok")
+        if r.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return r
+
+    # still throttled, decode_reply reports the error; the host is answering,
+    # slowing down is left to the limiter
+    breaker.record_success()
+    return r
+
+
+def api_get(
+    params: dict[str, typing.Any], use_cache: bool = True, lang: str | None = None
+) -> dict[str, Any]:
+    """Make call to Wikipedia API.
+
+    Uses the current language unless lang is given.
+    """
+    lang = lang or get_current_language()
+    cache = get_response_cache() if use_cache else None
+    if cache:
+        cached = cache.get(lang, params)
+        if cached is not None:
+            return cached
+
+    key = make_key(lang, params)
+
+    def fetch() -> str:
+        with singleflight.process_lock(key):
+            if cache and singleflight.lock_dir:
+                # another worker process may have fetched it while we waited
+                cached = cache.get(lang, params)
+                if cached is not None:
+                    return json.dumps(cached)
+            text = send("GET", lang, params=params).text
+            if cache:
+                cache.set(lang, params, decode_reply(text))
+            return text
+
+    # the reply is shared as text, every caller gets its own decoded copy
+    text, shared = in_flight.do(key, fetch)
+    return decode_reply(text)
+
+
+def get_first_page(
+    params: dict[str, str], use_cache: bool = True, lang: str | None = None
+) -> dict[str, typing.Any]:
     """Run Wikipedia API query and return the first page."""
-    page: dict[str, typing.Any] = api_get(params)["query"]["pages"][0]
+    return first_page(api_get(params, use_cache, lang=lang))
+
+
+def first_page(ret: dict[str, typing.Any]) -> dict[str, typing.Any]:
+    """First page in an API reply, MissingPage if the page doesn't exist."""
+    page: dict[str, typing.Any] = ret["query"]["pages"][0]
     if page.get("missing"):
         raise MissingPage
     return page
 
 
-def random_article_list(limit: int = 50) -> list[dict[str, typing.Any]]:
+def random_article_list(
+    limit: int = 50, lang: str | None = None
+) -> list[dict[str, typing.Any]]:
     """Random list of articles."""
     params = {
         "list": "random",
@@ -107,131 +351,275 @@ def random_article_list(limit: int = 50) -> list[dict[str, typing.Any]]:
         "rnlimit": limit,
     }
 
-    return typing.cast(list[dict[str, typing.Any]], api_get(params)["query"]["random"])
+    return typing.cast(
+        list[dict[str, typing.Any]], api_get(params, lang=lang)["query"]["random"]
+    )
 
 
-def wiki_search(q: str) -> tuple[int, list[dict[str, typing.Any]]]:
-    """Run search on Wikipedia."""
-    m = re_disambig.match(q)
-    if m:
-        search = '"{}" AND "{}"'.format(*m.groups())
-    else:
-        search = '"{}"'.format(q)
+# CirrusSearch won't return results beyond this offset
+max_search_offset = 10_000
+search_page_size = 50
 
-    params = {
+
+def search_params(q: str) -> dict[str, typing.Any]:
+    """Parameters for a search query, disambiguation terms are split."""
+    m = re_disambig.match(q)
+    search = '"{}" AND "{}"'.format(*m.groups()) if m else '"{}"'.format(q)
+    return {
         "list": "search",
         "srwhat": "text",
-        "srlimit": 50,
+        "srlimit": search_page_size,
         "srsearch": search,
-        "continue": "",
     }
-    ret = api_get(params)
+
+
+def wiki_search(
+    q: str, lang: str | None = None, target: int = 550, parallel: bool = True
+) -> tuple[int, list[dict[str, typing.Any]]]:
+    """Run search on Wikipedia, return total hits and up to target results.
+
+    The first page of results includes the total number of hits, in parallel
+    mode the remaining pages are then fetched concurrently.
+    """
+    params = {**search_params(q), "continue": ""}
+    ret = api_get(params, lang=lang)
     query = ret["query"]
     totalhits = query["searchinfo"]["totalhits"]
     results = query["search"]
-    for _ in range(10):
-        if "continue" not in ret:
-            break
-        params["sroffset"] = ret["continue"]["sroffset"]
-        ret = api_get(params)
-        results += ret["query"]["search"]
-    return (totalhits, results)
-
-
-def get_wiki_info(q: str) -> str | None:
-    """Get destination of redirect."""
-    params = {
+    if "continue" not in ret:
+        return (totalhits, results[:target])
+
+    if not parallel:
+        while "continue" in ret and len(results) < target:
+            params["sroffset"] = ret["continue"]["sroffset"]
+            ret = api_get(params, lang=lang)
+            results += ret["query"]["search"]
+        return (totalhits, results[:target])
+
+    end = min(totalhits, target, max_search_offset)
+    offsets = range(ret["continue"]["sroffset"], end, search_page_size)
+
+    def get_page(offset: int) -> list[dict[str, typing.Any]]:
+        page: list[dict[str, typing.Any]] = api_get(
+            {**params, "sroffset": offset}, lang=lang
+        )["query"]["search"]
+        return page
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=paging_workers) as pool:
+        futures = [
+            pool.submit(contextvars.copy_context().run, get_page, offset)
+            for offset in offsets
+        ]
+        for future in futures:
+            results += future.result()
+    return (totalhits, results[:target])
+
+
+def redirect_params(titles: str) -> dict[str, typing.Any]:
+    """Parameters for a query that follows redirects, titles separated by |."""
+    return {
         "prop": "info",
         "redirects": "",
-        "titles": q,
+        "titles": titles,
     }
-    ret = api_get(params)["query"]
+
+
+def lookup_redirect(q: str, lang: str | None = None) -> RedirectEntry:
+    """Ask the API where a title redirects to."""
+    # the redirect cache has its own expiry and is invalidated when a page
+    # changes, a cached response would put the old answer straight back
+    ret = api_get(redirect_params(q), use_cache=False, lang=lang)
+    return parse_redirect(ret["query"])
+
+
+def parse_redirect(ret: dict[str, typing.Any]) -> RedirectEntry:
+    """Status and target for the single title in a redirect query reply."""
     if "interwiki" in ret:
-        return None
-    redirects = []
-    if ret.get("redirects"):
-        redirects = ret["redirects"]
-        if len(redirects) != 1:
-            # multiple redirects, we should explain to the user that this is
-            # unsupported
-            raise MultipleRedirects
+        return (redirect_cache.INTERWIKI, None)
+    redirects = ret.get("redirects") or []
+    if len(redirects) > 1:
+        return (redirect_cache.MULTIPLE, None)
     if ret["pages"][0].get("missing"):
-        raise MissingPage(q)
-    return redirects[0]["to"] if redirects else None
+        return (redirect_cache.MISSING, None)
+    if redirects:
+        return (redirect_cache.REDIRECT, redirects[0]["to"])
+    return (redirect_cache.NOT_REDIRECT, None)
 
 
-def cat_start(q: str) -> list[str]:
+def get_wiki_info(q: str, lang: str | None = None) -> str | None:
+    """Get destination of redirect."""
+    lang = lang or get_current_language()
+    cache = redirect_cache.get_redirect_cache()
+    entry = cache.get(lang, q) if cache is not None else None
+    if entry is None:
+        entry = lookup_redirect(q, lang)
+        if cache is not None:
+            cache.put(lang, q, *entry)
+    return redirect_target(q, entry)
+
+
+def redirect_target(q: str, entry: RedirectEntry) -> str | None:
+    """Redirect target for a lookup, raise for a missing page or double redirect."""
+    status, target = entry
+    if status == redirect_cache.MULTIPLE:
+        # multiple redirects, we should explain to the user that this is
+        # unsupported
+        raise MultipleRedirects
+    if status == redirect_cache.MISSING:
+        raise MissingPage(q)
+    return target
+
+
+def lookup_redirects(titles: list[str], lang: str) -> dict[str, RedirectEntry]:
+    """Ask the API where up to 50 titles redirect to."""
+    params = redirect_params("|".join(titles))
+    ret = api_get(params, use_cache=False, lang=lang)["query"]
+    normalized = {n["from"]: n["to"] for n in ret.get("normalized", [])}
+    redirects = {r["from"]: r["to"] for r in ret.get("redirects", [])}
+    interwiki = {i["title"] for i in ret.get("interwiki", [])}
+    pages = {page["title"]: page for page in ret.get("pages", [])}
+    entries: dict[str, RedirectEntry] = {}
+    for title in titles:
+        name = normalized.get(title, title)
+        if name in interwiki:
+            entries[title] = (redirect_cache.INTERWIKI, None)
+            continue
+        target = redirects.get(name)
+        if target in redirects:
+            entries[title] = (redirect_cache.MULTIPLE, None)
+            continue
+        page = pages.get(target or name)
+        if page is None:
+            continue
+        if page.get("missing"):
+            entries[title] = (redirect_cache.MISSING, None)
+        elif target:
+            entries[title] = (redirect_cache.REDIRECT, target)
+        else:
+            entries[title] = (redirect_cache.NOT_REDIRECT, None)
+    return entries
+
+
+def get_redirect_map(
+    titles: collections.abc.Iterable[str], lang: str | None = None
+) -> tuple[dict[str, str | None], set[str]]:
+    """Get destination of redirect for many titles, 50 titles per API call.
+
+    Returns the redirect target for each title, None if it isn't a redirect,
+    and the set of titles that are missing. Titles that lead to more than one
+    redirect are left out, get_wiki_info raises MultipleRedirects for them.
+    Titles in the redirect cache aren't sent to the API.
+    """
+    lang = lang or get_current_language()
+    cache = redirect_cache.get_redirect_cache()
+    entries: dict[str, RedirectEntry] = {}
+    todo = []
+    for title in dict.fromkeys(titles):
+        entry = cache.get(lang, title) if cache is not None else None
+        if entry is None:
+            todo.append(title)
+        else:
+            entries[title] = entry
+    for pos in range(0, len(todo), 50):
+        found = lookup_redirects(todo[pos : pos + 50], lang)
+        if cache is not None:
+            cache.prefill(lang, found)
+        entries.update(found)
+
+    redirect_map: dict[str, str | None] = {}
+    missing: set[str] = set()
+    for title, (status, target) in entries.items():
+        if status == redirect_cache.MISSING:
+            missing.add(title)
+        elif status != redirect_cache.MULTIPLE:
+            redirect_map[title] = target
+    return (redirect_map, missing)
+
+
+def cat_start(q: str, lang: str | None = None) -> list[str]:
     """Find categories that start with this prefix."""
-    params = {
-        "list": "allpages",
-        "apnamespace": 14,  # categories
-        "apfilterredir": "nonredirects",
-        "aplimit": 500,
-        "apprefix": q,
-    }
-    ret = api_get(params)["query"]
-    return [i["title"] for i in ret["allpages"] if i["title"] != q]
+    params = all_pages_params(q, namespace=14)  # categories
+    return other_titles(api_get(params, lang=lang)["query"]["allpages"], q)
 
 
-def all_pages(q: str) -> list[str]:
-    """Get all article titles with a given prefix."""
-    params = {
+def all_pages_params(q: str, namespace: int = 0) -> dict[str, typing.Any]:
+    """Parameters for listing the pages with a given prefix."""
+    return {
         "list": "allpages",
-        "apnamespace": 0,
+        "apnamespace": namespace,
         "apfilterredir": "nonredirects",
         "aplimit": 500,
         "apprefix": q,
     }
-    ret = api_get(params)["query"]
-    return [i["title"] for i in ret["allpages"] if i["title"] != q]
 
 
-def categorymembers(q: str) -> list[str]:
-    """List of category members."""
-    params = {
+def categorymembers_params(q: str) -> dict[str, typing.Any]:
+    """Parameters for listing the articles in a category."""
+    return {
         "list": "categorymembers",
         "cmnamespace": 0,
         "cmlimit": 500,
         "cmtitle": q[0].upper() + q[1:],
     }
-    ret = api_get(params)["query"]
-    return [i["title"] for i in ret["categorymembers"] if i["title"] != q]
 
 
-def find_disambig(titles: list[str]) -> list[str]:
+def other_titles(
+    docs: collections.abc.Iterable[dict[str, typing.Any]], q: str
+) -> list[str]:
+    """Titles from a list query, leaving out q."""
+    return [doc["title"] for doc in docs if doc["title"] != q]
+
+
+def all_pages(q: str, lang: str | None = None) -> list[str]:
+    """Get all article titles with a given prefix."""
+    ret = api_get(all_pages_params(q), lang=lang)["query"]
+    return other_titles(ret["allpages"], q)
+
+
+def categorymembers(q: str, lang: str | None = None) -> list[str]:
+    """List of category members."""
+    ret = api_get(categorymembers_params(q), lang=lang)["query"]
+    return other_titles(ret["categorymembers"], q)
+
+
+def find_disambig(titles: list[str], lang: str | None = None) -> list[str]:
     """Find disambiguation articles in the given list of titles."""
     titles = list(titles)
     assert titles
-    pos = 0
     disambig: list[str] = []
-    params = {
+    for pos in range(0, len(titles), 50):
+        params = disambig_params(titles[pos : pos + 50])
+        ret = api_get(params, lang=lang)
+        disambig += disambig_titles(ret)
+        for i in range(10):
+            if "continue" not in ret:
+                break
+            params["tlcontinue"] = ret["continue"]["tlcontinue"]
+            ret = api_get(params, lang=lang)
+            disambig += disambig_titles(ret)
+
+    return disambig
+
+
+def disambig_params(titles: list[str]) -> dict[str, typing.Any]:
+    """Parameters for checking up to 50 titles for disambiguation templates."""
+    return {
         "prop": "templates",
         "tllimit": 500,
         "tlnamespace": 10,  # templates
         "continue": "",
+        "titles": "|".join(titles),
     }
-    while pos < len(titles):
-        params["titles"] = "|".join(titles[pos : pos + 50])
-        ret = api_get(params)
-        disambig.extend(
-            doc["title"] for doc in ret["query"]["pages"] if is_disambig(doc)
-        )
-        for i in range(10):
-            if "continue" not in ret:
-                break
-            tlcontinue = ret["continue"]["tlcontinue"]
-            params["titles"] = "|".join(titles[pos : pos + 50])
-            params["tlcontinue"] = tlcontinue
-            ret = api_get(params)
-            disambig.extend(
-                doc["title"] for doc in ret["query"]["pages"] if is_disambig(doc)
-            )
-        pos += 50
 
-    return disambig
+
+def disambig_titles(ret: dict[str, typing.Any]) -> list[str]:
+    """Disambiguation pages in a reply to a templates query."""
+    return [doc["title"] for doc in ret["query"]["pages"] if is_disambig(doc)]
 
 
-def wiki_redirects(q: str) -> collections.abc.Iterator[str]:  # pages that link here
+def wiki_redirects(
+    q: str, lang: str | None = None
+) -> collections.abc.Iterator[str]:  # pages that link here
     """Find redirects to this article."""
     params = {
         "list": "backlinks",
@@ -240,35 +628,155 @@ def wiki_redirects(q: str) -> collections.abc.Iterator[str]:  # pages that link
         "blnamespace": 0,
         "bltitle": q,
     }
-    docs = api_get(params)["query"]["backlinks"]
+    docs = api_get(params, lang=lang)["query"]["backlinks"]
     assert all("redirect" in doc for doc in docs)
     return (doc["title"] for doc in docs)
 
 
-def wiki_backlink(q: str) -> tuple[set[str], set[str]]:
-    """Get backlinks for article."""
-    params = {
+def query_iter(
+    params: dict[str, typing.Any], key: str, lang: str | None = None
+) -> collections.abc.Iterator[dict[str, typing.Any]]:
+    """Yield items from a list query, fetching one page at a time.
+
+    Pages are only requested as the caller consumes the items, stop iterating
+    to skip the rest.
+    """
+    for ret in query_replies(params, lang=lang):
+        yield from ret["query"][key]
+
+
+def query_replies(
+    params: dict[str, typing.Any], lang: str | None = None
+) -> collections.abc.Iterator[dict[str, typing.Any]]:
+    """Yield each reply to a query, following continuations."""
+    params = {**params, "continue": ""}
+    while True:
+        ret = api_get(params, lang=lang)
+        yield ret
+        if "continue" not in ret:
+            break
+        params = {**params, **ret["continue"]}
+
+
+def backlink_params(q: str) -> dict[str, typing.Any]:
+    """Parameters for a backlinks query."""
+    return {
         "list": "backlinks",
         "bllimit": 500,
         "blnamespace": 0,
         "bltitle": q,
-        "continue": "",
     }
-    ret = api_get(params)
-    docs = ret["query"]["backlinks"]
-    while "continue" in ret:
-        params["blcontinue"] = ret["continue"]["blcontinue"]
-        ret = api_get(params)
-        docs += ret["query"]["backlinks"]
 
-    articles = {doc["title"] for doc in docs if "redirect" not in doc}
-    redirects = {doc["title"] for doc in docs if "redirect" in doc}
+
+def iter_backlinks(
+    q: str, lang: str | None = None
+) -> collections.abc.Iterator[dict[str, typing.Any]]:
+    """Yield backlinks for article, redirects have a 'redirect' key."""
+    return query_iter(backlink_params(q), "backlinks", lang=lang)
+
+
+def iter_search(
+    q: str, lang: str | None = None
+) -> collections.abc.Iterator[dict[str, typing.Any]]:
+    """Yield search results."""
+    return query_iter(search_params(q), "search", lang=lang)
+
+
+def iter_categorymembers(
+    q: str, lang: str | None = None
+) -> collections.abc.Iterator[str]:
+    """Yield titles of category members."""
+    docs = query_iter(categorymembers_params(q), "categorymembers", lang=lang)
+    return (doc["title"] for doc in docs if doc["title"] != q)
+
+
+def iter_all_pages(q: str, lang: str | None = None) -> collections.abc.Iterator[str]:
+    """Yield article titles with a given prefix."""
+    docs = query_iter(all_pages_params(q), "allpages", lang=lang)
+    return (doc["title"] for doc in docs if doc["title"] != q)
+
+
+def wiki_backlink(q: str, lang: str | None = None) -> tuple[set[str], set[str]]:
+    """Get backlinks for article."""
+    return split_backlinks(iter_backlinks(q, lang=lang))
+
+
+def split_backlinks(
+    docs: collections.abc.Iterable[dict[str, typing.Any]],
+) -> tuple[set[str], set[str]]:
+    """Split backlinks into articles and redirects."""
+    articles: set[str] = set()
+    redirects: set[str] = set()
+    for doc in docs:
+        (redirects if "redirect" in doc else articles).add(doc["title"])
     return (articles, redirects)
 
 
-def call_get_diff(title: str, section_num: int, section_text: str) -> str:
+def wiki_backlink_within(
+    q: str, max_pages: int, lang: str | None = None
+) -> tuple[set[str], set[str]] | None:
+    """Get backlinks for article, None if there are more than max_pages pages."""
+    docs: list[dict[str, typing.Any]] = []
+    for num, ret in enumerate(query_replies(backlink_params(q), lang=lang)):
+        docs += ret["query"]["backlinks"]
+        if "continue" in ret and num + 1 >= max_pages:
+            return None
+    return split_backlinks(docs)
+
+
+def links_to(
+    titles: collections.abc.Iterable[str],
+    targets: collections.abc.Iterable[str],
+    lang: str | None = None,
+) -> set[str]:
+    """Find which of the given articles link to any of the targets.
+
+    Asks about the articles, 50 at a time, instead of downloading every
+    backlink of the targets. Up to 50 targets are supported.
+    """
+    titles = list(titles)
+    targets = list(targets)
+    assert len(targets) <= 50
+    found: set[str] = set()
+    for pos in range(0, len(titles), 50):
+        params = {
+            "prop": "links",
+            "pllimit": "max",
+            "titles": "|".join(titles[pos : pos + 50]),
+            "pltitles": "|".join(targets),
+            "continue": "",
+        }
+        while True:
+            ret = api_get(params, lang=lang)
+            query = ret["query"]
+            # the API normalises titles, map them back to what the caller gave us
+            normalized = {n["to"]: n["from"] for n in query.get("normalized", [])}
+            for page in query["pages"]:
+                if page.get("links"):
+                    found.add(normalized.get(page["title"], page["title"]))
+            if "continue" not in ret:
+                break
+            params = {**params, **ret["continue"]}
+    return found
+
+
+def call_get_diff(
+    title: str, section_num: int, section_text: str, lang: str | None = None
+) -> str:
     """Get edit diff."""
-    data = {
+    data = diff_params(title, section_num, section_text)
+    lang = lang or get_current_language()
+    text, shared = in_flight.do(
+        "diff:" + make_key(lang, data), lambda: send("POST", lang, data=data).text
+    )
+    return diff_body(decode_reply(text))
+
+
+def diff_params(
+    title: str, section_num: int, section_text: str
+) -> dict[str, typing.Any]:
+    """Parameters for a diff of new section text against the current article."""
+    return {
         "prop": "revisions",
         "rvprop": "timestamp",
         "titles": title,
@@ -276,8 +784,8 @@ def call_get_diff(title: str, section_num: int, section_text: str) -> str:
         "rvdifftotext": section_text.strip(),
     }
 
-    s = get_session()
-    ret = s.post(get_query_url(), data=data).json()
-    check_for_error(ret)
+
+def diff_body(ret: dict[str, typing.Any]) -> str:
+    """HTML diff in a reply to a diff query."""
     diff: str = ret["query"]["pages"][0]["revisions"][0]["diff"]["body"]
     return diff
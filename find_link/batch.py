@@ -0,0 +1,317 @@
+"""Run find_link over a list of terms from the command line.
+
+    python -m find_link.batch terms.jsonl -o results.jsonl --workers 8
+
+Each input line is a search term, or a term and the article to link it from.
+JSONL lines are objects with "term" and optional "article" and "lang" keys,
+or plain strings. CSV files need a header row with the same column names.
+
+A term on its own is searched for with do_search and every result is
+checked. Results are written to the output as JSONL, one line per article
+with the replacement, section number, match type or error.
+
+Finished jobs are recorded in a checkpoint file next to the output. Running
+the same command again skips them, so an interrupted run can be resumed.
+Jobs with an error, for example when the request budget ran out, aren't
+recorded, the next run drops their output and tries them again.
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import dataclasses
+import json
+import multiprocessing
+import os
+import sys
+import time
+import typing
+
+from . import cache, ratelimit, singleflight
+from .api import MediawikiError, MissingPage, MultipleRedirects, get_wiki_info
+from .core import do_search, get_article
+from .language import use_language
+from .match import LinkReplace, NoMatch, find_link_edit
+from .parse_cache import get_parsed
+from .timeouts import deadline
+
+Row = dict[str, typing.Any]
+
+
+@dataclasses.dataclass
+class Job:
+    """A term, and optionally the article to link it from."""
+
+    num: int  # position in the input, used for checkpoints
+    term: str
+    article: str | None = None
+    lang: str = "en"
+
+
+@dataclasses.dataclass
+class Settings:
+    """Options that workers need."""
+
+    max_articles: int = 20
+    job_timeout: float | None = None
+
+
+def read_jobs(path: str, lang: str = "en") -> list[Job]:
+    """Read jobs from a JSONL or CSV file."""
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith(".csv"):
+            items: typing.Iterable[typing.Any] = csv.DictReader(f)
+        else:
+            items = (json.loads(line) for line in f if line.strip())
+        jobs = []
+        for num, item in enumerate(items):
+            if isinstance(item, str):
+                item = {"term": item}
+            jobs.append(
+                Job(
+                    num=num,
+                    term=item["term"].strip(),
+                    article=(item.get("article") or "").strip() or None,
+                    lang=(item.get("lang") or "").strip() or lang,
+                )
+            )
+    return jobs
+
+
+def link_article(
+    job: Job, title: str, linkto: str | None = None, match: str | None = None
+) -> Row:
+    """Try to add a link to the term in one article."""
+    row: Row = {
+        "job": job.num,
+        "term": job.term,
+        "article": title,
+        "lang": job.lang,
+        "match": match,
+    }
+    try:
+        article = get_article(title)
+        table = get_parsed(article)
+        edit = find_link_edit(job.term, article.content, linkto, table)
+    except NoMatch:
+        return row | {"status": "no_match"}
+    except LinkReplace:
+        return row | {"status": "link_replace"}
+    except MissingPage:
+        return row | {"status": "missing"}
+    except MediawikiError as e:
+        return row | {"status": "error", "error": str(e)}
+    return row | {
+        "status": "ok",
+        "replacement": edit.replacement,
+        "replaced_text": edit.replaced_text,
+        "section": table.index.section_at(edit.start),
+    }
+
+
+def search_and_link(job: Job, settings: Settings) -> list[Row]:
+    """Search for the term and try to link it in each result."""
+    row: Row = {"job": job.num, "term": job.term, "article": None, "lang": job.lang}
+    try:
+        redirect_to = get_wiki_info(job.term)
+        reply = do_search(job.term, redirect_to)
+    except MissingPage:
+        return [row | {"status": "missing"}]
+    except MultipleRedirects:
+        return [row | {"status": "error", "error": "redirect to a redirect"}]
+    except MediawikiError as e:
+        return [row | {"status": "error", "error": str(e)}]
+    if reply["skipped"]:
+        # out of time or budget, results could include pages that already
+        # link to the term or disambiguation pages
+        skipped = ", ".join(reply["skipped"])
+        return [row | {"status": "error", "error": f"search incomplete: {skipped}"}]
+    results = reply["results"]
+    if not results:
+        return [row | {"status": "no_results"}]
+    return [
+        link_article(job, doc["title"], redirect_to, doc.get("match"))
+        for doc in results[: settings.max_articles]
+    ]
+
+
+def run_job(job: Job, settings: Settings) -> list[Row]:
+    """Run one job, in the job's language and with its deadline."""
+    with use_language(job.lang):
+        if settings.job_timeout:
+            with deadline(settings.job_timeout):
+                return run(job, settings)
+        return run(job, settings)
+
+
+def run(job: Job, settings: Settings) -> list[Row]:
+    """Run one job."""
+    if job.article:
+        return [link_article(job, job.article)]
+    return search_and_link(job, settings)
+
+
+def init_worker(cache_db: str | None, budget: ratelimit.RequestBudget | None) -> None:
+    """Set up the shared cache and request budget in a worker process."""
+    if cache_db:
+        cache.configure(db_path=cache_db)
+        singleflight.configure_lock_dir(cache_db + ".locks")
+    ratelimit.request_budget = budget
+
+
+class Checkpoint:
+    """Record of finished jobs, kept next to the output file."""
+
+    def __init__(self, output: str) -> None:
+        """Read jobs finished by an earlier run."""
+        self.path = output + ".checkpoint"
+        self.done: set[int] = set()
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.done = {int(line) for line in f if line.strip()}
+
+    def clean_output(self, output: str) -> None:
+        """Drop output from jobs that didn't finish."""
+        if not os.path.exists(output):
+            return
+        tmp = output + ".tmp"
+        with (
+            open(output, encoding="utf-8") as src,
+            open(tmp, "w", encoding="utf-8") as dest,
+        ):
+            for line in src:
+                if line.strip() and json.loads(line)["job"] in self.done:
+                    dest.write(line)
+        os.replace(tmp, output)
+
+    def add(self, f: typing.TextIO, num: int) -> None:
+        """Record a finished job."""
+        f.write(f"{num}\n")
+        f.flush()
+        self.done.add(num)
+
+
+class Progress:
+    """Progress reports on stderr."""
+
+    def __init__(self, total: int, every: float = 10.0) -> None:
+        """Init."""
+        self.total = total
+        self.every = every
+        self.done = 0
+        self.rows = 0
+        self.errors = 0
+        self.start = self.last = time.monotonic()
+
+    def update(self, rows: list[Row]) -> None:
+        """Count a finished job, report if it is time."""
+        self.done += 1
+        self.rows += len(rows)
+        self.errors += sum(1 for row in rows if row["status"] == "error")
+        now = time.monotonic()
+        if now - self.last < self.every and self.done < self.total:
+            return
+        self.last = now
+        rate = self.done / max(now - self.start, 1e-9)
+        eta = (self.total - self.done) / rate if rate else 0
+        budget = ratelimit.request_budget
+        used = f", requests {budget.used()}" if budget is not None else ""
+        print(
+            f"{self.done}/{self.total} jobs, {self.rows} results, "
+            + f"{self.errors} errors, {rate:.2f} jobs/s, eta {eta:.0f}s{used}",
+            file=sys.stderr,
+        )
+
+
+def make_pool(args: argparse.Namespace) -> concurrent.futures.Executor:
+    """Process or thread pool, set up for the shared cache and budget."""
+    budget = None
+    if args.processes:
+        cache_db = args.cache_db or args.output + ".cache.sqlite"
+        if args.budget:
+            manager = multiprocessing.Manager()
+            budget = ratelimit.RequestBudget(
+                args.budget, manager.dict(), manager.Lock()
+            )
+        ratelimit.request_budget = budget  # for progress reports
+        return concurrent.futures.ProcessPoolExecutor(
+            args.workers, initializer=init_worker, initargs=(cache_db, budget)
+        )
+    if args.budget:
+        budget = ratelimit.RequestBudget(args.budget)
+    init_worker(args.cache_db, budget)
+    if not args.cache_db:
+        cache.configure()
+    return concurrent.futures.ThreadPoolExecutor(args.workers)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="python -m find_link.batch",
+        description="Run find_link over a list of terms or term/article pairs.",
+    )
+    parser.add_argument("input", help="JSONL or CSV file of jobs")
+    parser.add_argument("-o", "--output", required=True, help="JSONL results file")
+    parser.add_argument("--lang", default="en", help="default language code")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--processes", action="store_true", help="use processes instead of threads"
+    )
+    parser.add_argument(
+        "--max-articles",
+        type=int,
+        default=20,
+        help="search results to check for each term",
+    )
+    parser.add_argument(
+        "--budget", type=int, help="most API requests to send to each host"
+    )
+    parser.add_argument("--cache-db", help="SQLite response cache shared by workers")
+    parser.add_argument("--job-timeout", type=float, help="seconds per job")
+    parser.add_argument(
+        "--progress-every", type=float, default=10.0, help="seconds between reports"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the batch."""
+    args = parse_args(argv)
+    settings = Settings(max_articles=args.max_articles, job_timeout=args.job_timeout)
+    checkpoint = Checkpoint(args.output)
+    checkpoint.clean_output(args.output)
+    jobs = [
+        job
+        for job in read_jobs(args.input, args.lang)
+        if job.num not in checkpoint.done
+    ]
+    progress = Progress(len(jobs), args.progress_every)
+    with (
+        make_pool(args) as pool,
+        open(args.output, "a", encoding="utf-8") as out,
+        open(checkpoint.path, "a") as checkpoint_file,
+    ):
+        futures = {pool.submit(run_job, job, settings): job for job in jobs}
+        for future in concurrent.futures.as_completed(futures):
+            job = futures[future]
+            try:
+                rows = future.result()
+            except Exception as e:
+                # not recorded in the checkpoint, the next run tries it again
+                print(f"job {job.num} ({job.term}) failed: {e!r}", file=sys.stderr)
+                progress.update([])
+                continue
+            out.write(
+                "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+            )
+            out.flush()
+            if all(row["status"] != "error" for row in rows):
+                checkpoint.add(checkpoint_file, job.num)
+            progress.update(rows)
+    if not jobs:
+        print("nothing to do, every job has finished", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Cache of Wikipedia API responses.
+
+There are two tiers: an in-process LRU and an optional SQLite database on disk
+that survives restarts and can be shared by several worker processes.
+"""
+
+import collections
+import json
+import sqlite3
+import threading
+import time
+import typing
+from typing import Any
+
+import flask
+
+# Time to live in seconds for each type of query, zero means don't cache.
+query_ttl: dict[str, int] = {
+    "search": 60 * 60,
+    "backlinks": 60 * 60,
+    "allpages": 24 * 60 * 60,
+    "categorymembers": 24 * 60 * 60,
+    "templates": 24 * 60 * 60,
+    "info": 60 * 60,
+    "revisions": 5 * 60,
+    "revisions|info": 5 * 60,
+    "random": 0,
+    "recentchanges": 0,
+}
+default_ttl = 60 * 60
+
+
+def query_type(params: dict[str, Any]) -> str:
+    """Type of query, used to pick the TTL."""
+    return str(params.get("list") or params.get("prop") or "")
+
+
+def ttl_for(params: dict[str, Any]) -> int:
+    """Number of seconds to cache the response to this query."""
+    return query_ttl.get(query_type(params), default_ttl)
+
+
+def make_key(lang: str, params: dict[str, Any]) -> str:
+    """Cache key for a query, parameter order and value types don't matter."""
+    items = sorted((k, str(v)) for k, v in params.items())
+    return lang + ":" + json.dumps(items, ensure_ascii=False)
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache with per-entry expiry."""
+
+    def __init__(self, maxsize: int = 1000) -> None:
+        """Init."""
+        self.maxsize = maxsize
+        self.data: collections.OrderedDict[str, tuple[float, Any]] = (
+            collections.OrderedDict()
+        )
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Number of entries."""
+        return len(self.data)
+
+    def get(self, key: str) -> Any:
+        """Get value from cache, None if missing or expired."""
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.time():
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """Add value to cache."""
+        with self.lock:
+            self.data[key] = (time.time() + ttl, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove everything from the cache."""
+        with self.lock:
+            self.data.clear()
+
+
+class SQLiteCache:
+    """Cache stored in a SQLite database."""
+
+    def __init__(self, path: str) -> None:
+        """Open database and create the table if needed."""
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self.db:
+            self.db.execute(
+                "create table if not exists response "
+                + "(key text primary key, expires real, value text)"
+            )
+
+    def get(self, key: str) -> tuple[float, str] | None:
+        """Get expiry time and value, None if missing or expired."""
+        with self.lock:
+            row = self.db.execute(
+                "select expires, value from response where key=?", (key,)
+            ).fetchone()
+        if row is None or row[0] < time.time():
+            return None
+        return typing.cast(tuple[float, str], row)
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        """Save value to the database."""
+        with self.lock, self.db:
+            self.db.execute(
+                "insert or replace into response (key, expires, value) "
+                + "values (?, ?, ?)",
+                (key, time.time() + ttl, value),
+            )
+
+    def purge(self) -> int:
+        """Delete expired entries, return the number deleted."""
+        with self.lock, self.db:
+            cur = self.db.execute(
+                "delete from response where expires < ?", (time.time(),)
+            )
+        return cur.rowcount
+
+    def clear(self) -> None:
+        """Delete everything."""
+        with self.lock, self.db:
+            self.db.execute("delete from response")
+
+
+class ResponseCache:
+    """Two tier cache of API responses with hit and miss counters.
+
+    Responses are kept as JSON text so every caller gets a fresh copy that it
+    is free to modify.
+    """
+
+    def __init__(self, maxsize: int = 1000, db_path: str | None = None) -> None:
+        """Init."""
+        self.memory = LRUCache(maxsize)
+        self.disk = SQLiteCache(db_path) if db_path else None
+        self.counts: collections.Counter[str] = collections.Counter()
+
+    def get(self, lang: str, params: dict[str, Any]) -> dict[str, Any] | None:
+        """Look for a cached response."""
+        if not ttl_for(params):
+            return None
+        key = make_key(lang, params)
+        text = self.memory.get(key)
+        if text is not None:
+            self.counts["memory_hit"] += 1
+        elif self.disk and (row := self.disk.get(key)):
+            expires, text = row
+            self.counts["disk_hit"] += 1
+            self.memory.set(key, text, expires - time.time())
+        else:
+            self.counts["miss"] += 1
+            return None
+        return typing.cast(dict[str, Any], json.loads(text))
+
+    def set(self, lang: str, params: dict[str, Any], value: dict[str, Any]) -> None:
+        """Store a response."""
+        ttl = ttl_for(params)
+        if not ttl:
+            return
+        key = make_key(lang, params)
+        text = json.dumps(value)
+        self.memory.set(key, text, ttl)
+        if self.disk:
+            self.disk.set(key, text, ttl)
+        self.counts["store"] += 1
+
+    def stats(self) -> dict[str, int]:
+        """Hit and miss counters."""
+        return {
+            "memory_hit": self.counts["memory_hit"],
+            "disk_hit": self.counts["disk_hit"],
+            "miss": self.counts["miss"],
+            "store": self.counts["store"],
+            "memory_size": len(self.memory),
+        }
+
+    def clear(self) -> None:
+        """Empty both tiers."""
+        self.memory.clear()
+        if self.disk:
+            self.disk.clear()
+        self.counts.clear()
+
+
+response_cache: ResponseCache | None = None
+
+
+def get_response_cache() -> ResponseCache | None:
+    """Get the response cache, None if caching is disabled."""
+    return response_cache
+
+
+def configure(maxsize: int = 1000, db_path: str | None = None) -> ResponseCache:
+    """Enable the response cache."""
+    global response_cache
+    response_cache = ResponseCache(maxsize, db_path)
+    return response_cache
+
+
+def disable() -> None:
+    """Switch off the response cache."""
+    global response_cache
+    response_cache = None
+
+
+def init_app(app: flask.Flask) -> None:
+    """Set up the response cache from the app config."""
+    if not app.config.get("CACHE_ENABLED", True):
+        return
+    configure(app.config.get("CACHE_SIZE", 1000), app.config.get("CACHE_DB"))
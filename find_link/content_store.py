@@ -0,0 +1,150 @@
+"""Store of article wikitext keyed by revision.
+
+Article text is only downloaded again when the latest revision ID reported by
+the API changes. The store has a memory budget, least recently used articles
+are evicted to stay under it.
+"""
+
+import collections
+import dataclasses
+import sys
+import threading
+import time
+
+import flask
+
+from .wikitext import SectionIndex
+
+
+@dataclasses.dataclass
+class Article:
+    """Wikitext of an article at a given revision."""
+
+    title: str
+    revid: int
+    timestamp: str
+    content: str
+    checked: float = 0.0  # when revid was last confirmed to be current
+    sections: SectionIndex | None = dataclasses.field(
+        default=None, repr=False, compare=False
+    )
+
+    @property
+    def size(self) -> int:
+        """Approximate memory used by the article text."""
+        return sys.getsizeof(self.content)
+
+
+ArticleKey = tuple[str, str]  # (lang, title)
+
+
+class ContentStore:
+    """LRU store of articles with a budget in bytes."""
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_article_bytes: int | None = None,
+        recheck_after: float = 5.0,
+    ) -> None:
+        """Init."""
+        self.max_bytes = max_bytes
+        # don't let a single huge article push everything else out
+        self.max_article_bytes = max_article_bytes or max_bytes // 8
+        # skip the revision check when the article was confirmed this recently,
+        # covers the same article being used more than once by a single request
+        self.recheck_after = recheck_after
+        self.articles: collections.OrderedDict[ArticleKey, Article] = (
+            collections.OrderedDict()
+        )
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.counts: collections.Counter[str] = collections.Counter()
+
+    def __len__(self) -> int:
+        """Number of articles in the store."""
+        return len(self.articles)
+
+    def get(self, lang: str, title: str) -> Article | None:
+        """Get article, it might not be the latest revision."""
+        with self.lock:
+            article = self.articles.get((lang, title))
+            if article:
+                self.articles.move_to_end((lang, title))
+            return article
+
+    def count(self, event: str) -> None:
+        """Count a hit, stale or miss for the stats."""
+        with self.lock:
+            self.counts[event] += 1
+
+    def needs_check(self, article: Article) -> bool:
+        """Is it time to check the revision ID again."""
+        return time.time() - article.checked > self.recheck_after
+
+    def put(self, lang: str, article: Article) -> None:
+        """Add article to the store, evicting others to stay within budget."""
+        if article.size > self.max_article_bytes:
+            self.count("too_big")
+            self.discard(lang, article.title)
+            return
+        article.checked = time.time()
+        key = (lang, article.title)
+        with self.lock:
+            old = self.articles.pop(key, None)
+            if old:
+                self.total_bytes -= old.size
+            self.articles[key] = article
+            self.total_bytes += article.size
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self.articles.popitem(last=False)
+                self.total_bytes -= evicted.size
+                self.counts["evicted"] += 1
+
+    def discard(self, lang: str, title: str) -> None:
+        """Remove article from the store."""
+        with self.lock:
+            old = self.articles.pop((lang, title), None)
+            if old:
+                self.total_bytes -= old.size
+
+    def stats(self) -> dict[str, int]:
+        """Counters and memory use."""
+        return {
+            "articles": len(self.articles),
+            "bytes": self.total_bytes,
+            "hit": self.counts["hit"],
+            "stale": self.counts["stale"],
+            "miss": self.counts["miss"],
+            "evicted": self.counts["evicted"],
+            "too_big": self.counts["too_big"],
+        }
+
+
+content_store: ContentStore | None = ContentStore()
+
+
+def get_content_store() -> ContentStore | None:
+    """Get the content store, None if disabled."""
+    return content_store
+
+
+def configure(
+    max_bytes: int = 64 * 1024 * 1024, max_article_bytes: int | None = None
+) -> ContentStore:
+    """Replace the content store with one using the given budget."""
+    global content_store
+    content_store = ContentStore(max_bytes, max_article_bytes)
+    return content_store
+
+
+def disable() -> None:
+    """Switch off the content store."""
+    global content_store
+    content_store = None
+
+
+def init_app(app: flask.Flask) -> None:
+    """Set up the content store from the app config."""
+    if "CONTENT_STORE_BYTES" in app.config:
+        configure(app.config["CONTENT_STORE_BYTES"])
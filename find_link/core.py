@@ -1,37 +1,86 @@
 """Core functions."""
 
+import concurrent.futures
+import contextvars
 import html
 import re
+import time
 import typing
 from typing import Any
 
+from . import redirect_cache
 from .api import (
+    DeadlineExceeded,
+    HostUnavailable,
     MediawikiError,
     all_pages,
     cat_start,
     categorymembers,
     find_disambig,
     get_first_page,
+    links_to,
     wiki_backlink,
+    wiki_backlink_within,
+    wiki_redirects,
     wiki_search,
 )
+from .content_store import Article, get_content_store
+from .language import get_current_language
 from .util import case_flip_first, norm
 
 re_redirect = re.compile(r"#REDIRECT \[\[(.)([^#]*?)(#.*)?\]\]")
 
 
-def get_content_and_timestamp(title: str) -> tuple[str, str]:
-    """Get article content and timestamp of last update."""
+def get_lastrevid(title: str) -> int | None:
+    """Get ID of the latest revision of an article."""
+    params = {"prop": "info", "titles": title}
+    json_data: dict[str, Any] = get_first_page(params, use_cache=False)
+    return typing.cast(int | None, json_data.get("lastrevid"))
+
+
+def get_article(title: str) -> Article:
+    """Get article, only download the wikitext if there is a new revision."""
+    lang = get_current_language()
+    store = get_content_store()
+    article = store.get(lang, title) if store is not None else None
+    if store is not None and article:
+        if not store.needs_check(article):
+            store.count("hit")
+            return article
+        if get_lastrevid(title) == article.revid:
+            store.count("hit")
+            store.put(lang, article)
+            return article
+        store.count("stale")
+        # the page was edited, it may have become a redirect or stopped being one
+        redirect_cache.invalidate(lang, title)
+    elif store is not None:
+        store.count("miss")
+
     params = {
         "prop": "revisions|info",
         "rvprop": "content|timestamp",
         "titles": title,
     }
-    json_data: dict[str, Any] = get_first_page(params)
+    json_data: dict[str, Any] = get_first_page(params, use_cache=False)
     if json_data.get("invalid"):
         raise MediawikiError(json_data["invalidreason"])
     rev = json_data["revisions"][0]
-    return (rev["content"], rev["timestamp"])
+    article = Article(
+        title=title,
+        revid=json_data.get("lastrevid", 0),
+        timestamp=rev["timestamp"],
+        content=rev["content"],
+    )
+    if store is not None and article.revid:
+        store.put(lang, article)
+    return article
+
+
+def get_content_and_timestamp(title: str) -> tuple[str, str]:
+    """Get article content and timestamp of last update."""
+    article = get_article(title)
+    return (article.content, article.timestamp)
 
 
 def is_redirect_to(title_from: str, title_to: str) -> bool:
@@ -48,22 +97,14 @@ def is_redirect_to(title_from: str, title_to: str) -> bool:
     return m.group(1).upper() + m.group(2) == title_to
 
 
-def find_longer(q: str, search: list[dict[str, Any]], articles: set[str]) -> list[str]:
-    """Find other articles with titles that are longer."""
-    this_title = q[0].upper() + q[1:]
-    longer: list[str] = all_pages(this_title)
+def longer_search_titles(q: str, search: list[dict[str, Any]]) -> list[str]:
+    """Titles of search results that contain the search term and are longer."""
     lq = q.lower()
-    for doc in search:
-        lt = doc["title"].lower()
-        if lq == lt or lq not in lt:
-            continue
-        articles.add(doc["title"])
-        more_articles, more_redirects = wiki_backlink(doc["title"])
-        articles.update(more_articles)
-        if doc["title"] not in longer:
-            longer.append(doc["title"])
-
-    return longer
+    return [
+        doc["title"]
+        for doc in search
+        if lq != doc["title"].lower() and lq in doc["title"].lower()
+    ]
 
 
 def tidy_snippet(snippet: str) -> str:
@@ -111,41 +152,193 @@ def match_type(q: str, snippet: str) -> str | None:
     return match
 
 
-def do_search(q: str, redirect_to: str | None) -> dict[str, typing.Any]:
-    """Run search."""
-    this_title = q[0].upper() + q[1:]
+# Upper limit on concurrent API calls made by a single search.
+search_workers = 8
+
+# With more pages of backlinks than this it is cheaper to ask whether each
+# search result links to the article than to download all the backlinks.
+backlink_page_budget = 4
 
-    totalhits, search = wiki_search(q)
-    articles, redirects = wiki_backlink(redirect_to or q)
-    cm = set()
-    start = cat_start(q)
-    if len(start) > 5:
-        start = []  # big categories take too long
-    for cat in set(["Category:" + this_title] + start):
-        cm.update(categorymembers(cat))
+T = typing.TypeVar("T")
+AnyFuture = concurrent.futures.Future[typing.Any]
 
+
+def timed_call(func: typing.Callable[..., T], *args: typing.Any) -> tuple[T, float]:
+    """Call function, return the result and how long it took."""
+    start = time.perf_counter()
+    result = func(*args)
+    return (result, time.perf_counter() - start)
+
+
+def matching_redirects(q: str, redirects: set[str]) -> set[str]:
+    """Redirects that are a variation of the search term or contain it."""
     norm_q = norm(q)
     norm_match_redirect = {r for r in redirects if norm(r) == norm_q}
     longer_redirect = {r for r in redirects if q.lower() in r.lower()}
+    return norm_match_redirect | longer_redirect
 
-    articles.add(this_title)
-    if redirect_to:
-        articles.add(redirect_to[0].upper() + redirect_to[1:])
 
-    longer_redirect = {r for r in redirects if q.lower() in r.lower()}
-    for r in norm_match_redirect | longer_redirect:
-        articles.add(r)
-        a2, r2 = wiki_backlink(r)
-        articles.update(a2)
-        redirects.update(r2)
+def do_search(
+    q: str,
+    redirect_to: str | None,
+    timings: dict[str, float] | None = None,
+    exclusion: str = "auto",
+) -> dict[str, typing.Any]:
+    """Run search.
+
+    API calls that don't depend on each other run concurrently. If a timings
+    dict is passed it gets the time spent in each stage, in seconds.
+
+    Search results that already link to the article are excluded, exclusion
+    picks how to find them: 'backlinks' downloads every backlink of the
+    article, 'links' asks about the search results in batches of 50 and
+    'auto' uses backlinks unless there are more than backlink_page_budget
+    pages of them.
+
+    When the request deadline passes or Wikipedia stops responding, stages
+    that only refine the results are skipped and listed in 'skipped'.
+    """
+    assert exclusion in ("auto", "backlinks", "links")
+    start_time = time.perf_counter()
+    if timings is None:
+        timings = {}
+    this_title = q[0].upper() + q[1:]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=search_workers) as pool:
+        stage: dict[concurrent.futures.Future[typing.Any], str] = {}
+
+        def submit(
+            name: str, func: typing.Callable[..., T], *args: typing.Any
+        ) -> concurrent.futures.Future[tuple[T, float]]:
+            # copy the context so the worker thread sees the current request
+            context = contextvars.copy_context()
+            future = pool.submit(context.run, timed_call, func, *args)
+            stage[future] = name
+            return future
+
+        def result(future: concurrent.futures.Future[tuple[T, float]]) -> T:
+            value, elapsed = future.result()
+            name = stage[future]
+            timings[name] = timings.get(name, 0.0) + elapsed
+            return value
+
+        skipped: set[str] = set()
+
+        def optional(
+            future: concurrent.futures.Future[tuple[T, float]], default: T
+        ) -> T:
+            try:
+                return result(future)
+            except (DeadlineExceeded, HostUnavailable):
+                skipped.add(stage[future])
+                return default
+
+        target = redirect_to or q
+        search_future = submit("wiki_search", wiki_search, q)
+        backlink_future: AnyFuture | None = None
+        redirects_future: AnyFuture | None = None
+        if exclusion == "backlinks":
+            backlink_future = submit("wiki_backlink", wiki_backlink, target)
+        elif exclusion == "auto":
+            backlink_future = submit(
+                "wiki_backlink", wiki_backlink_within, target, backlink_page_budget
+            )
+        else:
+            redirects_future = submit("wiki_redirects", wiki_redirects, target)
+        cat_start_future = submit("cat_start", cat_start, q)
+        all_pages_future = (
+            submit("all_pages", all_pages, this_title) if len(q) > 6 else None
+        )
+
+        articles: set[str] = set()
+        redirects: set[str] = set()
+        cm_futures: list[AnyFuture] = []
+        redirect_futures: list[tuple[str, AnyFuture]] = []
+        longer_futures: list[tuple[str, AnyFuture]] = []
+        exclusion_future = backlink_future or redirects_future
+        assert exclusion_future
+        first: list[AnyFuture] = [search_future, cat_start_future, exclusion_future]
+        for future in concurrent.futures.as_completed(first):
+            if future is cat_start_future:
+                start = optional(cat_start_future, [])
+                if len(start) > 5:
+                    start = []  # big categories take too long
+                cm_futures = [
+                    submit("categorymembers", categorymembers, cat)
+                    for cat in set(["Category:" + this_title] + start)
+                ]
+            elif future is backlink_future:
+                backlinks = result(backlink_future)
+                if backlinks is None:
+                    # too many backlinks, check the search results instead
+                    redirects_future = submit("wiki_redirects", wiki_redirects, target)
+                    continue
+                articles, redirects = backlinks
+                redirect_futures = [
+                    (r, submit("redirect_backlinks", wiki_backlink, r))
+                    for r in matching_redirects(q, redirects)
+                ]
+            elif future is search_future:
+                totalhits, search = result(search_future)
+                if all_pages_future:
+                    longer_futures = [
+                        (title, submit("longer_backlinks", wiki_backlink, title))
+                        for title in longer_search_titles(q, search)
+                    ]
+
+        link_check_futures = []
+        if redirects_future:
+            redirects = set(optional(redirects_future, []))
+            linked_redirects = matching_redirects(q, redirects)
+            articles.update(linked_redirects)
+            targets = [target] + sorted(linked_redirects)
+            titles = [doc["title"] for doc in search]
+            link_check_futures = [
+                submit("links_to", links_to, titles[i : i + 50], targets[j : j + 50])
+                for i in range(0, len(titles), 50)
+                for j in range(0, len(targets), 50)
+            ]
+
+        cm: set[str] = set()
+        for future in cm_futures:
+            members: list[str] = optional(future, [])
+            cm.update(members)
+
+        articles.add(this_title)
+        if redirect_to:
+            articles.add(redirect_to[0].upper() + redirect_to[1:])
+
+        for r, future in redirect_futures:
+            articles.add(r)
+            a2, r2 = optional(future, (set(), set()))
+            articles.update(a2)
+            redirects.update(r2)
+
+        for future in link_check_futures:
+            linked: set[str] = result(future)
+            articles.update(linked)
 
-    longer = find_longer(q, search, articles) if len(q) > 6 else None
+        longer: list[str] | None = None
+        if all_pages_future:
+            longer = optional(all_pages_future, [])
+            for title, future in longer_futures:
+                articles.add(title)
+                more_articles, more_redirects = optional(future, (set(), set()))
+                articles.update(more_articles)
+                if title not in longer:
+                    longer.append(title)
 
     search = [
         doc for doc in search if doc["title"] not in articles and doc["title"] not in cm
     ]
     if search:
-        disambig = set(find_disambig([doc["title"] for doc in search]))
+        disambig_start = time.perf_counter()
+        try:
+            disambig = set(find_disambig([doc["title"] for doc in search]))
+        except (DeadlineExceeded, HostUnavailable):
+            disambig = set()
+            skipped.add("find_disambig")
+        timings["find_disambig"] = time.perf_counter() - disambig_start
         search = [doc for doc in search if doc["title"] not in disambig]
         # and (doc['title'] not in links or this_title not in links[doc['title']])]
         for doc in search:
@@ -157,10 +350,12 @@ def do_search(q: str, redirect_to: str | None) -> dict[str, typing.Any]:
             )
             doc["match"] = match_type(q, without_markup)
             doc["snippet_without_markup"] = without_markup
+    timings["total"] = time.perf_counter() - start_time
     return {
         "totalhits": totalhits,
         "results": search,
         "longer": longer,
+        "skipped": sorted(skipped),
     }
 
 
@@ -1,7 +1,19 @@
 """Different language Wikipedias."""
 
+import contextlib
+import contextvars
+import typing
+
+import flask
 from flask import has_request_context, session
 
+# Set from the session at the start of each request. Unlike the session it is
+# visible to code running in thread pools and asyncio tasks, as long as they
+# run in a copy of the request context (asyncio does this automatically).
+current_language: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "current_language", default=None
+)
+
 langs = [
     ("af", "Afrikaans", "Afrikaans"),
     ("als", "Alemannisch", "Alemannic"),
@@ -148,4 +160,38 @@ def get_langs() -> list[dict[str, str]]:
 
 def get_current_language() -> str:
     """Get language code for the current language."""
+    lang = current_language.get()
+    if lang:
+        return lang
     return session.get("current_lang", "en") if has_request_context() else "en"
+
+
+def set_current_language(code: str) -> None:
+    """Switch language for the current context, and the session in a request."""
+    current_language.set(code)
+    if has_request_context():
+        session["current_lang"] = code
+
+
+@contextlib.contextmanager
+def use_language(code: str) -> typing.Iterator[None]:
+    """Use the given language inside a with block, for work outside Flask."""
+    token = current_language.set(code)
+    try:
+        yield
+    finally:
+        current_language.reset(token)
+
+
+def init_app(app: flask.Flask) -> None:
+    """Copy the language from the session into the context for each request."""
+
+    @app.before_request
+    def load_language() -> None:
+        flask.g.language_token = current_language.set(session.get("current_lang", "en"))
+
+    @app.teardown_request
+    def reset_language(exc: BaseException | None) -> None:
+        token = flask.g.pop("language_token", None)
+        if token is not None:
+            current_language.reset(token)
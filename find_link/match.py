@@ -1,14 +1,27 @@
 from __future__ import unicode_literals
 
 import collections
+import dataclasses
 import re
+import threading
+import time
 import typing
 
-from .api import MissingPage, call_get_diff, get_wiki_info
-from .core import get_case_from_content, get_content_and_timestamp
+from .api import MissingPage, call_get_diff
+from .core import get_article
+from .parse_cache import get_parsed
+from .resolver import Resolver, get_resolver
 from .util import is_title_case, lc_alpha
-
-re_link_in_text = re.compile(r"\[\[[^]]+?\]\]", re.I | re.S)
+from .wikitext import (
+    LINK,
+    SectionIndex,
+    SpanTable,
+    find_sections,
+    fold_case,
+    is_image_link,
+    re_cite_or_short_description,
+    re_link_in_text,
+)
 
 
 class LinkReplace(Exception):
@@ -58,10 +71,78 @@ class NoMatch(Exception):
     """No match found."""
 
 
-re_cite_or_short_description = re.compile(
-    r"(?:{{Short description|(.*?)}}|<ref( [^>]*?)?>\s*({{cite.*?}}|\[https?://[^]]*?\])\s*</ref>)",
-    re.I | re.S,
-)
+T = typing.TypeVar("T")
+
+
+class MatcherCache:
+    """LRU cache of compiled link patterns keyed by (q, variant).
+
+    Records the time spent compiling, and the compile time saved by hits.
+    """
+
+    def __init__(self, maxsize: int = 256) -> None:
+        """Init."""
+        self.maxsize = maxsize
+        self.entries: collections.OrderedDict[
+            tuple[str, str], tuple[typing.Any, float]
+        ] = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.counts: collections.Counter[str] = collections.Counter()
+        self.compile_time = 0.0
+        self.saved_time = 0.0
+
+    def __len__(self) -> int:
+        """Number of cached entries."""
+        return len(self.entries)
+
+    def get(self, q: str, variant: str, build: typing.Callable[[], T]) -> T:
+        """Get compiled patterns for q, calling build on a miss."""
+        key = (q, variant)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                value, cost = self.entries[key]
+                self.counts["hit"] += 1
+                self.saved_time += cost
+                return typing.cast(T, value)
+
+        start = time.perf_counter()
+        value = build()
+        cost = time.perf_counter() - start
+
+        with self.lock:
+            self.counts["miss"] += 1
+            self.compile_time += cost
+            self.entries[key] = (value, cost)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return value
+
+    def stats(self) -> dict[str, int | float]:
+        """Hit counts and compile time in seconds."""
+        return {
+            "hit": self.counts["hit"],
+            "miss": self.counts["miss"],
+            "size": len(self.entries),
+            "compile_time": self.compile_time,
+            "saved_time": self.saved_time,
+        }
+
+
+matcher_cache = MatcherCache()
+
+
+def get_link_patterns(q: str) -> tuple[re.Pattern[str], ...]:
+    """Compiled link patterns for q, in priority order."""
+    return matcher_cache.get(q, "link", lambda: tuple(p(q) for p in patterns))
+
+
+def get_extend_pattern(q: str, re_link: re.Pattern[str]) -> re.Pattern[str]:
+    """Pattern that extends a match of re_link to the end of the word."""
+    variant = "extend%d" % get_link_patterns(q).index(re_link)
+    return matcher_cache.get(
+        q, variant, lambda: re.compile(re_link.pattern + r"\w*\b", re.I)
+    )
 
 
 def parse_cite_or_short_descripton(
@@ -76,62 +157,29 @@ def parse_cite_or_short_descripton(
     yield ("text", text[prev:])
 
 
-re_heading = re.compile(r"^\s*(=+)\s*(.+)\s*\1(<!--.*-->|\s)*$")
-
-
 def section_iter(text: str) -> collections.abc.Iterator[tuple[str | None, str]]:
     """Iterate through an article section."""
-    cur_section = ""
-    heading = None
-    in_comment = False
-    for line in text.splitlines(True):
-        if "<!--" in line:
-            in_comment = True
-        if "-->" in line:
-            in_comment = False
-        m = re_heading.match(line)
-        if in_comment or not m:
-            cur_section += line
-            continue
-        if cur_section or heading:
-            yield (heading, cur_section)
-        heading = m.group()
-        cur_section = ""
-        continue
-    yield (heading, cur_section)
+    for heading_start, body_start, end in find_sections(text):
+        heading = text[heading_start:body_start] if body_start > heading_start else None
+        yield (heading, text[body_start:end])
 
 
-def get_subsections(text: str, section_num: int) -> str:
+def get_subsections(text: str, section_num: int, table: SpanTable | None = None) -> str:
     """Retrieve the text of subsections for a given section number within an article."""
-    found = ""
-    collection_level = None
-    for num, (heading, body) in enumerate(section_iter(text)):
-        if heading is None:
-            level = 0
-        else:
-            m = re_heading.match(heading)
-            assert m
-            level = len(m.group(1))
-        if num == section_num:
-            collection_level = level
-            continue
-        if collection_level:
-            if level > collection_level:
-                assert heading
-                found += heading + body
-            else:
-                break
-    return found
+    index = table.index if table is not None else SectionIndex(text)
+    start, end = index.subsections(section_num)
+    return text[start:end]
 
 
-def match_found(m: re.Match[str], q: str, linkto: str | None) -> str:
+def match_found(
+    m: re.Match[str], q: str, linkto: str | None, resolver: Resolver | None = None
+) -> str:
     if q[1:] == m.group(0)[1:]:
         replacement = m.group(1) + q[1:]
     elif any(c.isupper() for c in q[1:]) or m.group(0) == m.group(0).upper():
         replacement = q
     elif is_title_case(m.group(0)):
-        replacement = None
-        replacement = get_case_from_content(q)
+        replacement = get_resolver(resolver).get_case(q)
         if replacement is None:
             replacement = q.lower()
     else:
@@ -152,10 +200,7 @@ def parse_links(text: str) -> collections.abc.Iterator[tuple[str, str]]:
     for m in re_link_in_text.finditer(text):
         if prev != m.start():
             yield ("text", text[prev : m.start()])
-        if any(
-            m.group().lower().startswith("[[" + prefix)
-            for prefix in ("file:", "image:")
-        ):
+        if is_image_link(text, m.start()):
             yield ("image", m.group(0))
         else:
             yield ("link", m.group(0))
@@ -164,19 +209,89 @@ def parse_links(text: str) -> collections.abc.Iterator[tuple[str, str]]:
         yield ("text", text[prev:])
 
 
-def mk_link_matcher(q: str) -> typing.Callable[[str], re.Match[str] | None]:
-    """Make a link matcher."""
-    re_links = [p(q) for p in patterns]
-
-    def search_for_link(text: str) -> re.Match[str] | None:
-        for re_link in re_links:
-            m = re_link.search(text)
-            if m and m.group(0).count("[[") < 4:
-                return m
+re_literal_split = re.compile("[ ,\u2013-]+")
+
+
+def valid_link_match(m: re.Match[str]) -> bool:
+    """Match doesn't span too many links."""
+    return m.group(0).count("[[") < 4
+
+
+class LinkMatcher:
+    """Find the match for a link using all the patterns in a single scan.
+
+    Gives the same result as trying each pattern in turn and returning the
+    first match from the highest priority pattern that is valid.
+    """
+
+    def __init__(self, q: str) -> None:
+        """Init."""
+        self.q = q
+        self.re_links = get_link_patterns(q)
+        # each piece of q must appear in a match, hyphens can be inserted
+        self.literals = [w for w in re_literal_split.split(fold_case(q)) if w]
+
+    def might_match(self, text: str) -> bool:
+        """Cheap check that rules out text that can't contain a match."""
+        return self.might_match_folded(fold_case(text).replace("-", ""))
+
+    def might_match_folded(self, folded: str) -> bool:
+        """Prefilter for text that has been case folded with hyphens removed."""
+        return all(w in folded for w in self.literals)
+
+    def combined(self, count: int) -> re.Pattern[str]:
+        """Alternation of the first count patterns, with a named group each."""
+        return matcher_cache.get(
+            self.q,
+            "combined%d" % count,
+            lambda: re.compile(
+                "|".join(
+                    "(?P<p%d>%s)" % (i, p.pattern)
+                    for i, p in enumerate(self.re_links[:count])
+                ),
+                re.I,
+            ),
+        )
+
+    def search(self, text: str) -> re.Match[str] | None:
+        """Find the link match."""
+        if not self.might_match(text):
+            return None
+        best = None
+        limit = len(self.re_links)  # only patterns before best are of interest
+        rejected: set[int] = set()  # first match of these was invalid
+        pos = 0
+        while limit and len(rejected) < limit:
+            combined = self.combined(limit)
+            m = combined.search(text, pos)
+            if not m:
+                break
+            start = m.start()
+            first = next(i for i in range(limit) if m.group("p%d" % i) is not None)
+            # alternation only reports the first pattern to match here, check
+            # the others as well, this is the first match for each of them
+            for i in range(first, limit):
+                if i in rejected:
+                    continue
+                found = self.re_links[i].match(text, start)
+                if not found:
+                    continue
+                if valid_link_match(found):
+                    best, limit = found, i
+                    break
+                rejected.add(i)
+            pos = start + 1
+        return best
+
+
+def get_link_matcher(q: str) -> LinkMatcher:
+    """Get link matcher for q."""
+    return matcher_cache.get(q, "matcher", lambda: LinkMatcher(q))
 
-        return None
 
-    return search_for_link
+def mk_link_matcher(q: str) -> typing.Callable[[str], re.Match[str] | None]:
+    """Make a link matcher."""
+    return get_link_matcher(q).search
 
 
 def add_link(m: re.Match[str], replacement: str, text: str) -> str:
@@ -184,18 +299,36 @@ def add_link(m: re.Match[str], replacement: str, text: str) -> str:
     return m.re.sub(lambda m: f"[[{replacement}]]", text, count=1)
 
 
+Tokens = collections.abc.Iterable[tuple[str, str]]
+
+
+def needs_redirect_check(q: str, link_dest: str) -> bool:
+    """Link destination might be a redirect to q, or an unrelated article."""
+    return len(link_dest) > len(q) and lc_alpha(q) not in lc_alpha(link_dest)
+
+
 def find_link_in_chunk(
-    q: str, content: str, linkto: str | None = None
+    q: str,
+    content: str,
+    linkto: str | None = None,
+    tokens: Tokens | None = None,
+    resolver: Resolver | None = None,
 ) -> tuple[str, str | None, str | None]:
+    """Find link in a chunk of text, tokens are from parse_links if not given.
+
+    Redirects and title case are looked up with the resolver, by default the
+    Wikipedia API.
+    """
+    resolver = get_resolver(resolver)
     search_for_link = mk_link_matcher(q)
-    new_content = ""
+    parts = []
     replacement = None
 
     match_in_non_link = False
     bad_link_match: bool = False
     found_text_to_link = None
 
-    for token_type, text in parse_links(content):
+    for token_type, text in parse_links(content) if tokens is None else tokens:
         if token_type == "text":
             if search_for_link(text):
                 match_in_non_link = True
@@ -204,7 +337,7 @@ def find_link_in_chunk(
             m = search_for_link(link_text)
             if m:
                 found_text_to_link = m.group(0)
-                replacement = match_found(m, q, linkto)
+                replacement = match_found(m, q, linkto, resolver)
                 text = before + sep + add_link(m, replacement, link_text) + "]]"
         elif token_type == "link" and not replacement and not match_in_non_link:
             link_text = text[2:-2]
@@ -213,42 +346,37 @@ def find_link_in_chunk(
                 link_dest, link_text = link_text.split("|", 1)
             m = search_for_link(link_text)
             if m and (not link_dest or not link_dest.startswith("#")):
-                lc_alpha_q = lc_alpha(q)
-
-                bad_link_match = bool(
-                    link_dest
-                    and len(link_dest) > len(q)
-                    and (lc_alpha_q not in lc_alpha(link_dest))
-                )
+                bad_link_match = bool(link_dest and needs_redirect_check(q, link_dest))
                 if not link_dest:
                     if q in link_text and len(link_text) > len(q):
                         bad_link_match = True
                 if bad_link_match and link_dest:
                     try:
-                        link_dest_redirect = get_wiki_info(link_dest)
+                        link_dest_redirect = resolver.get_redirect(link_dest)
                     except MissingPage:
                         link_dest_redirect = None
                     if (
                         link_dest_redirect
-                        and lc_alpha(link_dest_redirect) == lc_alpha_q
+                        and lc_alpha(link_dest_redirect) == lc_alpha(q)
                     ):
                         bad_link_match = False
                 if not bad_link_match:
-                    replacement = match_found(m, q, linkto)
+                    replacement = match_found(m, q, linkto, resolver)
                     found_text_to_link = m.group(0)
                     text = add_link(m, replacement, link_text)
-        new_content += text
+        parts.append(text)
+    new_content = "".join(parts)
     if not replacement:
         if bad_link_match:
             raise LinkReplace
         m = search_for_link(content)
         if m:
             found_text_to_link = m.group(0)
-            replacement = match_found(m, q, linkto)
+            replacement = match_found(m, q, linkto, resolver)
             new_content = add_link(m, replacement, content)
             if linkto:
                 m_end = m.end()
-                re_extend = re.compile(m.re.pattern + r"\w*\b", re.I)
+                re_extend = get_extend_pattern(q, m.re)
                 m = re_extend.search(content)
                 if m and m.end() > m_end:
                     replacement += content[m_end : m.end()]
@@ -257,107 +385,298 @@ def find_link_in_chunk(
     return (new_content, replacement, found_text_to_link)
 
 
-def find_link_in_content(
-    q: str, content: str, linkto: str | None = None
-) -> tuple[str, str, str | None]:
+def redirect_candidates(q: str, table: SpanTable) -> list[str]:
+    """Destinations of links matching q that find_link_in_chunk might resolve."""
+    table.scan_to(len(table.sections))
+    search_for_link = mk_link_matcher(q)
+    text = table.text
+    candidates = []
+    for start, end in table.find(LINK):
+        link_text = text[start + 2 : end - 2]
+        if "|" not in link_text:
+            continue
+        link_dest, link_text = link_text.split("|", 1)
+        if link_dest.startswith("#") or not needs_redirect_check(q, link_dest):
+            continue
+        if search_for_link(link_text):
+            candidates.append(link_dest)
+    return candidates
+
+
+class ArticleResolver:
+    """Resolver for matching q in one article.
+
+    The first redirect lookup prefetches every link destination in the
+    article that might need one, so they are looked up together.
+    """
+
+    def __init__(self, q: str, table: SpanTable, resolver: Resolver) -> None:
+        """Init."""
+        self.q = q
+        self.table = table
+        self.resolver = resolver
+        self.prefetched = False
+
+    def get_redirect(self, title: str) -> str | None:
+        """Redirect target of title, None if not a redirect."""
+        if not self.prefetched:
+            self.prefetched = True
+            self.resolver.prefetch_redirects(redirect_candidates(self.q, self.table))
+        return self.resolver.get_redirect(title)
+
+    def get_case(self, title: str) -> str | None:
+        """Title as written in the article text, None if not found."""
+        return self.resolver.get_case(title)
+
+    def prefetch_redirects(self, titles: collections.abc.Iterable[str]) -> None:
+        """Redirect targets of these titles will be needed soon."""
+        self.resolver.prefetch_redirects(titles)
+
+
+def chunk_tokens(table: SpanTable, start: int, end: int) -> Tokens:
+    """Text, link and image tokens for a chunk of the article."""
+    text = table.text
+    return ((token_type, text[s:e]) for token_type, s, e in table.tokens(start, end))
+
+
+@dataclasses.dataclass
+class LinkEdit:
+    """Article text with a link added, and where it changed."""
+
+    content: str
+    replacement: str
+    replaced_text: str | None
+    start: int  # start of the change, the same in the old and new text
+    old_end: int  # end of the changed text in the original content
+    new_end: int  # end of the changed text in the new content
+
+    def excerpt(self, context: int = 200) -> str:
+        """New text around the change."""
+        start = max(0, self.start - context)
+        return self.content[start : self.new_end + context]
+
+
+def common_prefix_length(a: str, b: str) -> int:
+    """Length of the common prefix, found with a binary search."""
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[low:mid] == b[low:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def changed_span(old_text: str, new_text: str) -> tuple[int, int, int]:
+    """Start of the change, and its length in the old and new text."""
+    prefix = common_prefix_length(old_text, new_text)
+    suffix = common_prefix_length(old_text[prefix:][::-1], new_text[prefix:][::-1])
+    return (prefix, len(old_text) - prefix - suffix, len(new_text) - prefix - suffix)
+
+
+def find_link_edit(
+    q: str,
+    content: str,
+    linkto: str | None = None,
+    table: SpanTable | None = None,
+    resolver: Resolver | None = None,
+) -> LinkEdit:
+    """Find the first place to link q and splice the link into the content.
+
+    Sections are only tokenized as they are reached, scanning stops at the
+    first chunk of text with an accepted match.
+    """
+    if table is None:
+        table = SpanTable(content, SectionIndex(content))
+    resolver = get_resolver(resolver)
     if linkto:
         try:
-            return find_link_in_content(linkto, content)
+            return find_link_edit(linkto, content, table=table, resolver=resolver)
         except NoMatch:
             pass
-    replacement = None
-    new_content = ""
+    return find_term_edit(q, content, linkto, table, resolver)
+
+
+def find_term_edit(
+    q: str, content: str, linkto: str | None, table: SpanTable, resolver: Resolver
+) -> LinkEdit:
+    """Find the first place to link q, without trying linkto first."""
+    if not get_link_matcher(q).might_match_folded(table.folded):
+        raise NoMatch
+    resolver = ArticleResolver(q, table, resolver)
     link_replace = False
-    for header, section_text in section_iter(content):
-        if header:
-            new_content += header
-        for token_type, text in parse_cite_or_short_descripton(section_text):
-            if token_type == "text" and not replacement:
-                try:
-                    (new_text, replacement, replaced_text) = find_link_in_chunk(
-                        q, text, linkto=linkto
-                    )
-                except LinkReplace:
-                    link_replace = True
-                if replacement:
-                    text = new_text
-            new_content += text
-    if replacement:
-        return (new_content, replacement, replaced_text)
+    for section_num, (heading_start, body_start, section_end) in enumerate(
+        table.sections
+    ):
+        table.scan_to(section_num)
+        for token_type, start, end in table.chunks(body_start, section_end):
+            if token_type != "text":
+                continue
+            old_text = content[start:end]
+            try:
+                (new_text, replacement, replaced_text) = find_link_in_chunk(
+                    q,
+                    old_text,
+                    linkto=linkto,
+                    tokens=chunk_tokens(table, start, end),
+                    resolver=resolver,
+                )
+            except LinkReplace:
+                link_replace = True
+                continue
+            if not replacement:
+                continue
+            (prefix, old_len, new_len) = changed_span(old_text, new_text)
+            return LinkEdit(
+                content=content[:start] + new_text + content[end:],
+                replacement=replacement,
+                replaced_text=replaced_text,
+                start=start + prefix,
+                old_end=start + prefix + old_len,
+                new_end=start + prefix + new_len,
+            )
     raise LinkReplace if link_replace else NoMatch
 
 
+def find_link_for_redirects(
+    q: str,
+    redirects: list[str],
+    content: str,
+    table: SpanTable | None = None,
+    resolver: Resolver | None = None,
+) -> tuple[str, LinkEdit]:
+    """Link to q using the first of its redirects found in the content.
+
+    Gives the same result as calling find_link_edit(r, content, linkto=q) for
+    each redirect in turn, but q is only searched for once and redirects that
+    can't match are ruled out together, checking the folded text once for
+    each distinct word. Returns the redirect and the edit, LinkReplace is
+    raised with the redirect as its argument.
+    """
+    if not redirects:
+        raise NoMatch
+    if table is None:
+        table = SpanTable(content, SectionIndex(content))
+    resolver = get_resolver(resolver)
+    try:
+        return (redirects[0], find_term_edit(q, content, None, table, resolver))
+    except LinkReplace:
+        raise LinkReplace(redirects[0])
+    except NoMatch:
+        pass
+
+    matchers = [get_link_matcher(r) for r in redirects]
+    folded = table.folded
+    found = {w for w in {w for m in matchers for w in m.literals} if w in folded}
+    for r, matcher in zip(redirects, matchers):
+        if not all(w in found for w in matcher.literals):
+            continue
+        try:
+            return (r, find_term_edit(r, content, q, table, resolver))
+        except LinkReplace:
+            raise LinkReplace(r)
+        except NoMatch:
+            pass
+    raise NoMatch
+
+
+def find_link_in_content(
+    q: str,
+    content: str,
+    linkto: str | None = None,
+    table: SpanTable | None = None,
+    resolver: Resolver | None = None,
+) -> tuple[str, str, str | None]:
+    edit = find_link_edit(q, content, linkto, table, resolver)
+    return (edit.content, edit.replacement, edit.replaced_text)
+
+
 FindLinkResult = dict[str, str | int]
 
 
 def find_link_and_section(
-    q: str, content: str, linkto: str | None = None
+    q: str,
+    content: str,
+    linkto: str | None = None,
+    table: SpanTable | None = None,
+    resolver: Resolver | None = None,
 ) -> FindLinkResult:
+    if table is None:
+        table = SpanTable(content, SectionIndex(content))
     if linkto:
         try:
-            return find_link_and_section(linkto, content)
+            return find_link_and_section(
+                linkto, content, table=table, resolver=resolver
+            )
         except NoMatch:
             pass
-    sections = list(section_iter(content))
+    if not get_link_matcher(q).might_match_folded(table.folded):
+        raise NoMatch
     replacement = None
 
     search_for_link = mk_link_matcher(q)
 
     found: FindLinkResult = {}
 
-    for section_num, (header, section_text) in enumerate(sections):
-        new_content = ""
-        if header:
-            new_content += header
-        for token_type, text in parse_cite_or_short_descripton(section_text):
-            if token_type == "text" and not replacement:
-                new_text = ""
-                for token_type2, text2 in parse_links(text):
-                    if token_type2 == "link" and not replacement:
-                        link_text = text2[2:-2]
-                        if "|" in link_text:
-                            link_dest, link_text = link_text.split("|", 1)
-                        else:
-                            link_dest = None
-                        m = search_for_link(link_text)
-                        if m:
-                            if link_dest:
-                                found["link_dest"] = link_dest
-                            found["link_text"] = link_text
-                            replacement = match_found(m, q, None)
-                            text2 = add_link(m, replacement, link_text)
-                    new_text += text2
-                if replacement:
-                    text = new_text
-                else:
-                    m = search_for_link(text)
+    for section_num, (heading_start, body_start, section_end) in enumerate(
+        table.sections
+    ):
+        table.scan_to(section_num)
+        for token_type, start, end in table.chunks(body_start, section_end):
+            if token_type != "text":
+                continue
+            parts = []
+            for token_type2, text2 in chunk_tokens(table, start, end):
+                if token_type2 == "link" and not replacement:
+                    link_text = text2[2:-2]
+                    if "|" in link_text:
+                        link_dest, link_text = link_text.split("|", 1)
+                    else:
+                        link_dest = None
+                    m = search_for_link(link_text)
                     if m:
-                        replacement = match_found(m, q, linkto)
-                        text = add_link(m, replacement, text)
-            new_content += text
-        if replacement:
-            found.update(
-                {
-                    "section_num": section_num,
-                    "section_text": new_content,
-                    "old_text": (header or "") + section_text,
-                    "replacement": replacement,
-                }
-            )
-            return found
+                        if link_dest:
+                            found["link_dest"] = link_dest
+                        found["link_text"] = link_text
+                        replacement = match_found(m, q, None, resolver)
+                        text2 = add_link(m, replacement, link_text)
+                parts.append(text2)
+            if replacement:
+                new_text = "".join(parts)
+            else:
+                text = content[start:end]
+                m = search_for_link(text)
+                if m:
+                    replacement = match_found(m, q, linkto, resolver)
+                    new_text = add_link(m, replacement, text)
+            if replacement:
+                found.update(
+                    {
+                        "section_num": section_num,
+                        "section_text": content[heading_start:start]
+                        + new_text
+                        + content[end:section_end],
+                        "old_text": content[heading_start:section_end],
+                        "replacement": replacement,
+                    }
+                )
+                return found
     raise NoMatch
 
 
 def get_diff(q: str, title: str, linkto: str | None) -> tuple[str, str]:
-    content, timestamp = get_content_and_timestamp(title)
-    found = find_link_and_section(q, content, linkto)
+    article = get_article(title)
+    content = article.content
+    table = get_parsed(article)
+    found = find_link_and_section(q, content, linkto, table)
 
     assert isinstance(found["section_num"], int)
     assert isinstance(found["section_text"], str)
     assert isinstance(found["replacement"], str)
 
     section_text = found["section_text"] + get_subsections(
-        content, found["section_num"]
+        content, found["section_num"], table
     )
 
     diff = call_get_diff(title, found["section_num"], section_text)
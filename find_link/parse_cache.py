@@ -0,0 +1,137 @@
+"""Cache of tokenized articles keyed by revision.
+
+The same article is often checked against several search terms, for example
+every result of one search and then every result of a related search. With
+the span table cached only the search for the new term is left to do.
+
+A span table holds the article text and a case folded copy, so the cache has
+a budget in bytes like the content store. Articles the content store turns
+away as too big aren't cached here either.
+"""
+
+import collections
+import sys
+import threading
+
+import flask
+
+from .content_store import Article, get_content_store
+from .language import get_current_language
+from .wikitext import SectionIndex, SpanTable
+
+ParseKey = tuple[str, str, int]  # (lang, title, revid)
+
+
+def table_size(table: SpanTable) -> int:
+    """Approximate memory used by a span table: the text and the folded copy."""
+    return 2 * sys.getsizeof(table.text)
+
+
+class ParseCache:
+    """LRU cache of span tables with a limit on count and bytes."""
+
+    def __init__(
+        self,
+        maxsize: int = 32,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_table_bytes: int | None = None,
+    ) -> None:
+        """Init."""
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.max_table_bytes = max_table_bytes or max_bytes // 8
+        self.tables: collections.OrderedDict[ParseKey, SpanTable] = (
+            collections.OrderedDict()
+        )
+        self.sizes: dict[ParseKey, int] = {}
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.counts: collections.Counter[str] = collections.Counter()
+
+    def __len__(self) -> int:
+        """Number of cached tables."""
+        return len(self.tables)
+
+    def get(self, key: ParseKey) -> SpanTable | None:
+        """Get span table."""
+        with self.lock:
+            table = self.tables.get(key)
+            if table is None:
+                self.counts["miss"] += 1
+                return None
+            self.tables.move_to_end(key)
+            self.counts["hit"] += 1
+            return table
+
+    def put(self, key: ParseKey, table: SpanTable) -> None:
+        """Add span table, evicting others to stay within budget."""
+        size = table_size(table)
+        if size > self.max_table_bytes:
+            self.counts["too_big"] += 1
+            return
+        with self.lock:
+            self.total_bytes += size - self.sizes.get(key, 0)
+            self.tables[key] = table
+            self.sizes[key] = size
+            self.tables.move_to_end(key)
+            while len(self.tables) > self.maxsize or self.total_bytes > self.max_bytes:
+                evicted, _ = self.tables.popitem(last=False)
+                self.total_bytes -= self.sizes.pop(evicted)
+
+    def stats(self) -> dict[str, int]:
+        """Counters and memory use."""
+        return {
+            "tables": len(self.tables),
+            "bytes": self.total_bytes,
+            "hit": self.counts["hit"],
+            "miss": self.counts["miss"],
+            "too_big": self.counts["too_big"],
+        }
+
+
+parse_cache: ParseCache | None = ParseCache()
+
+
+def get_parse_cache() -> ParseCache | None:
+    """Get the parse cache, None if disabled."""
+    return parse_cache
+
+
+def configure(maxsize: int = 32, max_bytes: int = 64 * 1024 * 1024) -> ParseCache:
+    """Replace the parse cache with one of the given size and budget."""
+    global parse_cache
+    parse_cache = ParseCache(maxsize, max_bytes)
+    return parse_cache
+
+
+def disable() -> None:
+    """Switch off the parse cache."""
+    global parse_cache
+    parse_cache = None
+
+
+def get_parsed(article: Article, lang: str | None = None) -> SpanTable:
+    """Span table for an article, each revision is tokenized once."""
+    cache = get_parse_cache()
+    key = (lang or get_current_language(), article.title, article.revid)
+    table = cache.get(key) if cache is not None and article.revid else None
+    if table is not None:
+        return table
+    if article.sections is None:
+        article.sections = SectionIndex(article.content)
+    # sections are tokenized as they are needed, the cached table fills in
+    table = SpanTable(article.content, article.sections)
+    store = get_content_store()
+    too_big = store is not None and article.size > store.max_article_bytes
+    if cache is not None and article.revid and not too_big:
+        cache.put(key, table)
+    return table
+
+
+def init_app(app: flask.Flask) -> None:
+    """Set up the parse cache from the app config."""
+    if "PARSE_CACHE_SIZE" in app.config or "PARSE_CACHE_BYTES" in app.config:
+        configure(
+            app.config.get("PARSE_CACHE_SIZE", 32),
+            app.config.get("PARSE_CACHE_BYTES", 64 * 1024 * 1024),
+        )
@@ -0,0 +1,218 @@
+"""Adaptive rate limiter for outbound Wikipedia API traffic.
+
+Each host gets a token bucket that limits requests per second and a limit on
+concurrent requests. The concurrency limit grows slowly while replies are
+fast and is halved when Wikimedia asks us to slow down, with a maxlag error
+or a 429/503 status. A Retry-After header pauses all requests to the host.
+"""
+
+import collections
+import threading
+import time
+import typing
+
+import flask
+
+# seconds to pause when told to back off without a Retry-After header
+default_pause = 5.0
+
+# times to retry a request that was throttled
+throttle_retries = 2
+
+# longest wait for the limiter when the request has no deadline
+max_queue_wait = 60.0
+
+# maxlag parameter added to every API call, None to leave it out
+maxlag: int | None = None
+
+limiter_config: dict[str, typing.Any] = {
+    "rate": 20.0,  # requests per second
+    "burst": 20,
+    "max_concurrency": 16,
+    "start_concurrency": 8,
+    "target_latency": 2.0,  # seconds, slower replies shrink the limit
+}
+
+
+class HostLimiter:
+    """Token bucket with an adaptive concurrency limit."""
+
+    def __init__(
+        self,
+        rate: float = 20.0,
+        burst: int = 20,
+        max_concurrency: int = 16,
+        start_concurrency: int = 8,
+        target_latency: float = 2.0,
+    ) -> None:
+        """Init."""
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.concurrency = float(start_concurrency)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.in_flight = 0
+        self.waiting = 0
+        self.paused_until = 0.0
+        self.cond = threading.Condition()
+        self.counts: collections.Counter[str] = collections.Counter()
+
+    def wait_time(self) -> float:
+        """Take a slot if one is free, otherwise return seconds to wait.
+
+        The caller must hold self.cond.
+        """
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.in_flight >= int(self.concurrency):
+            return 0.05  # woken early when a request finishes
+        if self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        self.tokens -= 1
+        self.in_flight += 1
+        return 0.0
+
+    def try_acquire(self) -> float:
+        """Non-blocking acquire, returns 0.0 on success or seconds to wait."""
+        with self.cond:
+            return self.wait_time()
+
+    def acquire(self, timeout: float | None = None) -> bool:
+        """Wait for a slot, return False if timeout passes first."""
+        end = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            self.waiting += 1
+            try:
+                while wait := self.wait_time():
+                    if end is not None:
+                        left = end - time.monotonic()
+                        if left <= 0:
+                            self.counts["timeout"] += 1
+                            return False
+                        wait = min(wait, left)
+                    self.cond.wait(wait)
+            finally:
+                self.waiting -= 1
+        return True
+
+    def release(
+        self, latency: float, outcome: str = "ok", retry_after: float | None = None
+    ) -> None:
+        """Request finished, outcome is 'ok', 'error', 'throttled' or 'cancelled'."""
+        with self.cond:
+            self.in_flight -= 1
+            self.counts[outcome] += 1
+            if outcome == "cancelled":
+                pass  # never sent, says nothing about the host
+            elif outcome == "throttled":
+                self.concurrency = max(1.0, self.concurrency / 2)
+                pause = retry_after if retry_after is not None else default_pause
+                self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            elif outcome == "error" or latency > self.target_latency:
+                self.concurrency = max(1.0, self.concurrency * 0.9)
+            else:
+                self.concurrency = min(
+                    self.max_concurrency, self.concurrency + 1 / self.concurrency
+                )
+            self.cond.notify_all()
+
+    def state(self) -> dict[str, typing.Any]:
+        """Current state for monitoring."""
+        with self.cond:
+            now = time.monotonic()
+            tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            return {
+                "tokens": round(tokens, 2),
+                "in_flight": self.in_flight,
+                "queue_depth": self.waiting,
+                "concurrency": round(self.concurrency, 2),
+                "paused_for": round(max(0.0, self.paused_until - now), 2),
+                "counts": dict(self.counts),
+            }
+
+
+class RequestBudget:
+    """Upper limit on the number of requests sent to each host.
+
+    For sharing between processes pass in a managed dict and lock.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        counts: typing.MutableMapping[str, int] | None = None,
+        lock: typing.ContextManager[typing.Any] | None = None,
+    ) -> None:
+        """Init."""
+        self.limit = limit
+        self.counts = counts if counts is not None else {}
+        self.lock = lock if lock is not None else threading.Lock()
+
+    def available(self, lang: str) -> bool:
+        """Is there anything left in the budget for the host."""
+        with self.lock:
+            return self.counts.get(lang, 0) < self.limit
+
+    def spend(self, lang: str) -> bool:
+        """Count a request, False if the budget for the host is used up."""
+        with self.lock:
+            used = self.counts.get(lang, 0)
+            if used >= self.limit:
+                return False
+            self.counts[lang] = used + 1
+            return True
+
+    def used(self) -> dict[str, int]:
+        """Requests sent so far, keyed by language."""
+        with self.lock:
+            return dict(self.counts)
+
+
+# requests left for each host, None for no limit
+request_budget: RequestBudget | None = None
+
+limiters: dict[str, HostLimiter] = {}
+limiters_lock = threading.Lock()
+
+
+def get_limiter(lang: str) -> HostLimiter:
+    """Get the limiter for a language."""
+    with limiters_lock:
+        if lang not in limiters:
+            limiters[lang] = HostLimiter(**limiter_config)
+        return limiters[lang]
+
+
+def limiter_state() -> dict[str, dict[str, typing.Any]]:
+    """State of every limiter, keyed by language."""
+    with limiters_lock:
+        current = dict(limiters)
+    return {lang: limiter.state() for lang, limiter in sorted(current.items())}
+
+
+def is_throttled(status: int, headers: typing.Mapping[str, str]) -> bool:
+    """Reply is Wikimedia asking us to slow down."""
+    return status in (429, 503) or headers.get("MediaWiki-API-Error") == "maxlag"
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Seconds from a Retry-After header, HTTP dates aren't supported."""
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def init_app(app: flask.Flask) -> None:
+    """Configure limits from the app config."""
+    global maxlag
+    maxlag = app.config.get("API_MAXLAG", 5)
+    if "API_RATE_LIMIT" in app.config:
+        limiter_config["rate"] = app.config["API_RATE_LIMIT"]
+    if "API_MAX_CONCURRENCY" in app.config:
+        limiter_config["max_concurrency"] = app.config["API_MAX_CONCURRENCY"]
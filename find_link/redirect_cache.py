@@ -0,0 +1,163 @@
+"""Cache of where titles redirect to.
+
+Redirects rarely change, so lookups are kept for a long time. Negative
+results are cached too: a missing page, a page that isn't a redirect, a
+redirect to a redirect and an interwiki link. Missing pages get a short TTL
+because somebody might create the article.
+"""
+
+import collections
+import threading
+import time
+import typing
+
+import flask
+
+# status of a title
+REDIRECT = "redirect"
+NOT_REDIRECT = "not_redirect"
+MISSING = "missing"
+MULTIPLE = "multiple"  # redirect to a redirect
+INTERWIKI = "interwiki"
+
+# Time to live in seconds for each status.
+status_ttl: dict[str, int] = {
+    REDIRECT: 24 * 60 * 60,
+    NOT_REDIRECT: 24 * 60 * 60,
+    MISSING: 60 * 60,
+    MULTIPLE: 6 * 60 * 60,
+    INTERWIKI: 7 * 24 * 60 * 60,
+}
+
+RedirectKey = tuple[str, str]  # (lang, title)
+RedirectEntry = tuple[str, str | None]  # (status, redirect target)
+
+
+class RedirectCache:
+    """LRU cache of redirect lookups with per-status expiry."""
+
+    def __init__(self, maxsize: int = 100_000) -> None:
+        """Init."""
+        self.maxsize = maxsize
+        self.entries: collections.OrderedDict[
+            RedirectKey, tuple[float, RedirectEntry]
+        ] = collections.OrderedDict()
+        # titles that redirect to each target, for invalidation
+        self.redirects_to: collections.defaultdict[RedirectKey, set[str]] = (
+            collections.defaultdict(set)
+        )
+        self.lock = threading.Lock()
+        self.counts: collections.Counter[str] = collections.Counter()
+
+    def __len__(self) -> int:
+        """Number of cached titles."""
+        return len(self.entries)
+
+    def get(self, lang: str, title: str) -> RedirectEntry | None:
+        """Get status and target for title, None if not cached or expired."""
+        key = (lang, title)
+        with self.lock:
+            item = self.entries.get(key)
+            if item is not None and item[0] < time.time():
+                self.remove(key)
+                item = None
+            if item is None:
+                self.counts["miss"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counts["hit"] += 1
+            return item[1]
+
+    def put(
+        self, lang: str, title: str, status: str, target: str | None = None
+    ) -> None:
+        """Store the status and target for title."""
+        key = (lang, title)
+        with self.lock:
+            self.remove(key)
+            self.entries[key] = (time.time() + status_ttl[status], (status, target))
+            if target is not None:
+                self.redirects_to[(lang, target)].add(title)
+            while len(self.entries) > self.maxsize:
+                self.remove(next(iter(self.entries)))
+
+    def prefill(self, lang: str, entries: typing.Mapping[str, RedirectEntry]) -> None:
+        """Store the results of a batched lookup."""
+        for title, (status, target) in entries.items():
+            self.put(lang, title, status, target)
+
+    def remove(self, key: RedirectKey) -> None:
+        """Remove an entry, the caller must hold the lock."""
+        item = self.entries.pop(key, None)
+        if item is None:
+            return
+        target = item[1][1]
+        if target is None:
+            return
+        titles = self.redirects_to.get((key[0], target))
+        if titles is not None:
+            titles.discard(key[1])
+            if not titles:
+                del self.redirects_to[(key[0], target)]
+
+    def invalidate(self, lang: str, title: str) -> None:
+        """Forget title and every title that redirects to it.
+
+        Call this when a page changes, it might have become a redirect or
+        stopped being one.
+        """
+        with self.lock:
+            for redirect in list(self.redirects_to.get((lang, title), ())):
+                self.remove((lang, redirect))
+            self.remove((lang, title))
+            self.counts["invalidated"] += 1
+
+    def clear(self) -> None:
+        """Remove everything from the cache."""
+        with self.lock:
+            self.entries.clear()
+            self.redirects_to.clear()
+
+    def stats(self) -> dict[str, int]:
+        """Counters."""
+        return {
+            "titles": len(self.entries),
+            "hit": self.counts["hit"],
+            "miss": self.counts["miss"],
+            "invalidated": self.counts["invalidated"],
+        }
+
+
+redirect_cache: RedirectCache | None = RedirectCache()
+
+
+def get_redirect_cache() -> RedirectCache | None:
+    """Get the redirect cache, None if disabled."""
+    return redirect_cache
+
+
+def configure(maxsize: int = 100_000) -> RedirectCache:
+    """Replace the redirect cache with one of the given size."""
+    global redirect_cache
+    redirect_cache = RedirectCache(maxsize)
+    return redirect_cache
+
+
+def disable() -> None:
+    """Switch off the redirect cache."""
+    global redirect_cache
+    redirect_cache = None
+
+
+def invalidate(lang: str, title: str) -> None:
+    """Page has changed, forget what we know about where it redirects."""
+    if redirect_cache is not None:
+        redirect_cache.invalidate(lang, title)
+
+
+def init_app(app: flask.Flask) -> None:
+    """Set up the redirect cache from the app config."""
+    if not app.config.get("REDIRECT_CACHE_ENABLED", True):
+        disable()
+    elif "REDIRECT_CACHE_SIZE" in app.config:
+        configure(app.config["REDIRECT_CACHE_SIZE"])
@@ -0,0 +1,127 @@
+"""Lookups the matching code needs from outside the article text.
+
+Matching asks two questions of the wiki: where does a link destination
+redirect to, and what case is an article title written in. A resolver
+answers them, matching code doesn't call the API itself. APIResolver asks
+the Wikipedia API, DictResolver answers from lookups gathered in advance.
+
+Before matching an article the matching code passes every link destination
+it might need to resolve to prefetch_redirects, so the API resolver can look
+them up in batches instead of one at a time.
+"""
+
+import collections.abc
+import typing
+
+from .api import MissingPage, get_redirect_map, get_wiki_info
+from .core import get_case_from_content
+from .language import use_language
+
+
+class Resolver(typing.Protocol):
+    """Answers lookups needed by the matching code."""
+
+    def get_redirect(self, title: str) -> str | None:
+        """Redirect target of title, None if not a redirect.
+
+        Raises MissingPage if the page doesn't exist.
+        """
+
+    def get_case(self, title: str) -> str | None:
+        """Title as written in the article text, None if not found."""
+
+    def prefetch_redirects(self, titles: collections.abc.Iterable[str]) -> None:
+        """Redirect targets of these titles will be needed soon."""
+
+
+class APIResolver:
+    """Resolver that calls the Wikipedia API.
+
+    Redirect lookups are kept, use a new resolver for each request.
+    """
+
+    def __init__(self, lang: str | None = None) -> None:
+        """Init."""
+        self.lang = lang
+        self.redirects: dict[str, str | None] = {}
+        self.missing: set[str] = set()
+
+    def get_redirect(self, title: str) -> str | None:
+        """Redirect target of title, None if not a redirect."""
+        if title in self.missing:
+            raise MissingPage(title)
+        if title not in self.redirects:
+            try:
+                self.redirects[title] = get_wiki_info(title, lang=self.lang)
+            except MissingPage:
+                self.missing.add(title)
+                raise
+        return self.redirects[title]
+
+    def prefetch_redirects(self, titles: collections.abc.Iterable[str]) -> None:
+        """Look up redirects in batches of 50 titles."""
+        todo = [t for t in titles if t not in self.redirects and t not in self.missing]
+        if not todo:
+            return
+        redirects, missing = get_redirect_map(todo, lang=self.lang)
+        self.redirects.update(redirects)
+        self.missing.update(missing)
+
+    def get_case(self, title: str) -> str | None:
+        """Title as written in the article text, None if not found."""
+        if self.lang is None:
+            return get_case_from_content(title)
+        with use_language(self.lang):
+            return get_case_from_content(title)
+
+
+class DictResolver:
+    """Resolver backed by lookups gathered in advance.
+
+    Titles that aren't known are passed to the fallback resolver, with no
+    fallback they are treated as not a redirect and case not found.
+    """
+
+    def __init__(
+        self,
+        redirects: dict[str, str | None] | None = None,
+        cases: dict[str, str | None] | None = None,
+        missing: set[str] | None = None,
+        fallback: Resolver | None = None,
+    ) -> None:
+        """Init."""
+        self.redirects = redirects if redirects is not None else {}
+        self.cases = cases if cases is not None else {}
+        self.missing = missing if missing is not None else set()
+        self.fallback = fallback
+
+    def get_redirect(self, title: str) -> str | None:
+        """Redirect target of title, None if not a redirect."""
+        if title in self.missing:
+            raise MissingPage(title)
+        if title in self.redirects:
+            return self.redirects[title]
+        if self.fallback is None:
+            return None
+        return self.fallback.get_redirect(title)
+
+    def get_case(self, title: str) -> str | None:
+        """Title as written in the article text, None if not found."""
+        if title in self.cases:
+            return self.cases[title]
+        if self.fallback is None:
+            return None
+        return self.fallback.get_case(title)
+
+    def prefetch_redirects(self, titles: collections.abc.Iterable[str]) -> None:
+        """Pass titles that aren't known to the fallback resolver."""
+        if self.fallback is None:
+            return
+        self.fallback.prefetch_redirects(
+            t for t in titles if t not in self.redirects and t not in self.missing
+        )
+
+
+def get_resolver(resolver: Resolver | None = None) -> Resolver:
+    """Resolver to use, a new API resolver unless one is given."""
+    return resolver if resolver is not None else APIResolver()
@@ -0,0 +1,132 @@
+"""Coalesce identical API calls that are in flight at the same time.
+
+The first caller for a key makes the call, anyone asking for the same key
+before it finishes waits and gets the same result. Waiting is limited by the
+request deadline, a caller that runs out of patience or sees the leader fail
+with an error from the leader's own deadline makes the call itself.
+
+Optionally lock files extend this across worker processes, combined with the
+shared SQLite response cache the second worker finds the first worker's
+result there. Keys are hashed onto a fixed set of lock files.
+"""
+
+import collections
+import contextlib
+import fcntl
+import hashlib
+import os
+import threading
+import time
+import typing
+
+from .timeouts import remaining
+
+T = typing.TypeVar("T")
+
+
+class Call:
+    """A call in progress."""
+
+    def __init__(self) -> None:
+        """Init."""
+        self.done = threading.Event()
+        self.value: typing.Any = None
+        self.error: BaseException | None = None
+
+
+class Group:
+    """Set of in-flight calls keyed by a string."""
+
+    def __init__(self, retry_on: tuple[type[BaseException], ...] = ()) -> None:
+        """Init.
+
+        Followers make the call themselves when the leader fails with one of
+        the retry_on errors, they are about the leader, not the call.
+        """
+        self.retry_on = retry_on
+        self.lock = threading.Lock()
+        self.calls: dict[str, Call] = {}
+        self.counts: collections.Counter[str] = collections.Counter()
+
+    def do(self, key: str, func: typing.Callable[[], T]) -> tuple[T, bool]:
+        """Run func unless a call for key is in progress.
+
+        Returns the result and whether it came from another caller.
+        """
+        with self.lock:
+            existing = self.calls.get(key)
+            if existing is None:
+                call = self.calls[key] = Call()
+            self.counts["shared" if existing else "leader"] += 1
+        if existing:
+            if not existing.done.wait(remaining()):
+                self.counts["gave_up"] += 1
+                return (func(), False)
+            if isinstance(existing.error, self.retry_on):
+                self.counts["retried"] += 1
+                return (func(), False)
+            if existing.error:
+                raise existing.error
+            return (typing.cast(T, existing.value), True)
+
+        try:
+            call.value = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return (call.value, False)
+
+
+lock_dir: str | None = None
+lock_stripes = 256  # number of lock files, keys that share one wait in turn
+
+# longest wait for a lock file when the request has no deadline
+max_lock_wait = 60.0
+lock_poll_interval = 0.01
+
+
+def lock_path(key: str) -> str:
+    """Lock file for key."""
+    assert lock_dir
+    stripe = int(hashlib.sha1(key.encode("utf-8")).hexdigest(), 16) % lock_stripes
+    return os.path.join(lock_dir, f"{stripe}.lock")
+
+
+@contextlib.contextmanager
+def process_lock(key: str) -> typing.Iterator[None]:
+    """Hold a lock file for key so only one worker process fetches it.
+
+    The lock only saves duplicate API calls, if it can't be taken before the
+    deadline the block runs without it.
+    """
+    if not lock_dir:
+        yield
+        return
+    left = remaining()
+    end = time.monotonic() + (max_lock_wait if left is None else left)
+    with open(lock_path(key), "a") as f:
+        while True:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= end:
+                    yield
+                    return
+                time.sleep(lock_poll_interval)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def configure_lock_dir(path: str | None) -> None:
+    """Coalesce calls across processes using lock files in this directory."""
+    global lock_dir
+    if path:
+        os.makedirs(path, exist_ok=True)
+    lock_dir = path
@@ -0,0 +1,228 @@
+"""Suggest links: article titles mentioned in an article without a link.
+
+Titles are normalised to a sequence of lower case words of letters and
+digits, digits are kept so "1990 FIFA World Cup" and "FIFA World Cup" stay
+apart. The index maps the normalised title to the title, and the first word
+to the most words any title starting with it has. Each chunk of article text
+is normalised the same way and scanned once, trying the word sequences
+starting at every word. Every hit is verified with the
+matching rules used by find_link before it is suggested.
+"""
+
+import dataclasses
+import re
+import threading
+import typing
+
+import flask
+
+from .api import MediawikiError, MissingPage
+from .match import (
+    LinkReplace,
+    changed_span,
+    chunk_tokens,
+    find_link_in_chunk,
+    needs_redirect_check,
+)
+from .resolver import DictResolver, Resolver, get_resolver
+from .util import starts_with_namespace
+from .wikitext import LINK, SectionIndex, SpanTable
+
+re_word = re.compile(r"[^\W_]+")
+
+
+def title_words(text: str) -> list[str]:
+    """Lower case words of letters and digits in text."""
+    return re_word.findall(text.lower())
+
+
+class TitleIndex:
+    """Normalised article titles for a single pass multi-title search."""
+
+    def __init__(self, titles: typing.Iterable[str] = (), min_words: int = 1) -> None:
+        """Init."""
+        self.min_words = min_words
+        self.titles: dict[str, str] = {}
+        self.max_words: dict[str, int] = {}
+        for title in titles:
+            self.add(title)
+
+    def __len__(self) -> int:
+        """Number of titles."""
+        return len(self.titles)
+
+    def add(self, title: str) -> None:
+        """Add a title, titles that normalise the same keep the first."""
+        title = title.replace("_", " ").strip()
+        if not title or starts_with_namespace(title):
+            return
+        words = title_words(title)
+        if len(words) < self.min_words:
+            return
+        self.titles.setdefault(" ".join(words), title)
+        if len(words) > self.max_words.get(words[0], 0):
+            self.max_words[words[0]] = len(words)
+
+    def find(self, text: str) -> typing.Iterator[tuple[str, str]]:
+        """Titles found in text as (key, title), in order of position."""
+        words = title_words(text)
+        titles = self.titles
+        for i, word in enumerate(words):
+            for n in range(1, self.max_words.get(word, 0) + 1):
+                key = " ".join(words[i : i + n])
+                if key in titles:
+                    yield (key, titles[key])
+
+    @classmethod
+    def load(cls, path: str, min_words: int = 1) -> "TitleIndex":
+        """Load titles from a file with one title per line."""
+        with open(path, encoding="utf-8") as f:
+            return cls((line.rstrip("\n") for line in f), min_words)
+
+
+@dataclasses.dataclass
+class Suggestion:
+    """Place in an article where a link to title can be added."""
+
+    title: str
+    replacement: str
+    replaced_text: str | None
+    start: int  # offsets of the text to replace in the article
+    end: int
+    new_text: str  # wikitext to replace it with
+
+
+def linked_titles(table: SpanTable) -> set[str]:
+    """Normalised titles the article already links to."""
+    text = table.text
+    linked = set()
+    for start, end in table.find(LINK):
+        dest = text[start + 2 : end - 2].partition("|")[0].partition("#")[0]
+        linked.add(" ".join(title_words(dest)))
+    return linked
+
+
+def links_to_resolve(
+    table: SpanTable, index: TitleIndex, done: set[str]
+) -> list[str]:
+    """Destinations of piped links with an index title in the link text.
+
+    find_link_in_chunk looks these up to check whether they redirect to the
+    title, they are fetched together before matching starts.
+    """
+    text = table.text
+    candidates = []
+    for start, end in table.find(LINK):
+        dest, pipe, link_text = text[start + 2 : end - 2].partition("|")
+        if not pipe or dest.startswith("#"):
+            continue
+        if any(
+            key not in done and needs_redirect_check(found, dest)
+            for key, found in index.find(link_text)
+        ):
+            candidates.append(dest)
+    return candidates
+
+
+def suggest_links(
+    content: str,
+    index: TitleIndex,
+    title: str | None = None,
+    table: SpanTable | None = None,
+    resolver: Resolver | None = None,
+    limit: int | None = None,
+) -> list[Suggestion]:
+    """Titles from the index that could be linked from the article.
+
+    Each title is suggested at most once, at the first place find_link would
+    add the link. Titles already linked from the article are skipped, so are
+    titles that fail a lookup.
+
+    Titles come from the index as written, so links use the title's own case
+    instead of downloading every candidate article to find it.
+    """
+    if table is None:
+        table = SpanTable(content, SectionIndex(content))
+    cases: dict[str, str | None] = {}
+    resolver = DictResolver(cases=cases, fallback=get_resolver(resolver))
+    table.scan_to(len(table.sections))
+    done = linked_titles(table)
+    if title:
+        done.add(" ".join(title_words(title)))
+    try:
+        resolver.prefetch_redirects(links_to_resolve(table, index, done))
+    except (MissingPage, MediawikiError):
+        pass  # each candidate that needs a lookup fails and is skipped
+
+    suggestions: list[Suggestion] = []
+    for _, body_start, section_end in table.sections:
+        for token_type, start, end in table.chunks(body_start, section_end):
+            if token_type != "text":
+                continue
+            old_text = content[start:end]
+            tried = set()
+            for key, found in index.find(old_text):
+                if key in done or key in tried:
+                    continue
+                tried.add(key)
+                cases[found] = found
+                try:
+                    new_text, replacement, replaced_text = find_link_in_chunk(
+                        found,
+                        old_text,
+                        tokens=chunk_tokens(table, start, end),
+                        resolver=resolver,
+                    )
+                except (LinkReplace, MissingPage, MediawikiError):
+                    continue
+                if not replacement:
+                    continue
+                done.add(key)
+                prefix, old_len, new_len = changed_span(old_text, new_text)
+                suggestions.append(
+                    Suggestion(
+                        title=found,
+                        replacement=replacement,
+                        replaced_text=replaced_text,
+                        start=start + prefix,
+                        end=start + prefix + old_len,
+                        new_text=new_text[prefix : prefix + new_len],
+                    )
+                )
+                if limit is not None and len(suggestions) >= limit:
+                    return suggestions
+    return suggestions
+
+
+title_index: TitleIndex | None = None
+titles_file: str | None = None
+min_words = 2  # single words are mostly too common to be worth suggesting
+load_lock = threading.Lock()
+
+
+def get_title_index() -> TitleIndex | None:
+    """Title index, loaded from the titles file on first use."""
+    global title_index
+    if title_index is None and titles_file:
+        with load_lock:
+            if title_index is None:
+                try:
+                    title_index = TitleIndex.load(titles_file, min_words)
+                except OSError:
+                    return None  # the page says suggestions aren't available
+    return title_index
+
+
+def configure(path: str | None, words: int = 2) -> None:
+    """Use titles from this file, it is loaded when first needed."""
+    global title_index, titles_file, min_words
+    titles_file = path
+    min_words = words
+    title_index = None
+
+
+def init_app(app: flask.Flask) -> None:
+    """Set up the title index from the app config."""
+    configure(
+        app.config.get("SUGGEST_TITLES_FILE"), app.config.get("SUGGEST_MIN_WORDS", 2)
+    )
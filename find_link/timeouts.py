@@ -0,0 +1,137 @@
+"""Request deadlines and a circuit breaker for each Wikipedia host.
+
+The deadline is kept in a context variable so it follows the request into
+thread pools started with a copy of the context.
+"""
+
+import contextlib
+import contextvars
+import threading
+import time
+import typing
+
+import flask
+
+# (connect, read) timeout in seconds when there is plenty of time left
+default_timeout = (3.05, 20.0)
+
+current_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar(
+    "current_deadline", default=None
+)
+
+
+def remaining() -> float | None:
+    """Seconds left before the deadline, None if there is no deadline."""
+    deadline = current_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def call_timeout() -> tuple[float, float] | None:
+    """Timeout for the next API call, None if the deadline has passed."""
+    left = remaining()
+    if left is None:
+        return default_timeout
+    if left <= 0:
+        return None
+    connect, read = default_timeout
+    return (min(connect, left), min(read, left))
+
+
+@contextlib.contextmanager
+def deadline(seconds: float) -> typing.Iterator[None]:
+    """Run a block with a deadline, an existing earlier deadline is kept."""
+    end = time.monotonic() + seconds
+    outer = current_deadline.get()
+    token = current_deadline.set(end if outer is None else min(outer, end))
+    try:
+        yield
+    finally:
+        current_deadline.reset(token)
+
+
+def init_app(app: flask.Flask) -> None:
+    """Give every request a deadline, REQUEST_DEADLINE seconds."""
+    seconds = app.config.get("REQUEST_DEADLINE", 25)
+    if not seconds:
+        return
+
+    @app.before_request
+    def start_deadline() -> None:
+        flask.g.deadline_token = current_deadline.set(time.monotonic() + seconds)
+
+    @app.teardown_request
+    def end_deadline(exc: BaseException | None) -> None:
+        token = flask.g.pop("deadline_token", None)
+        if token is not None:
+            current_deadline.reset(token)
+
+
+class CircuitBreaker:
+    """Stop calling a host after repeated failures.
+
+    After failure_threshold failures in a row the breaker opens and calls fail
+    straight away. Once reset_after seconds have passed a single trial call is
+    let through, success closes the breaker again. Every call let through by
+    allow must end with record_success, record_failure or release_trial.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_after: float = 30.0) -> None:
+        """Init."""
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Current state: closed, open or half-open."""
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_after:
+            return "open"
+        return "half-open"
+
+    def allow(self) -> bool:
+        """Can a call be made now."""
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def release_trial(self) -> None:
+        """Call let through by allow finished without an outcome."""
+        with self.lock:
+            self.trial_running = False
+
+    def record_success(self) -> None:
+        """Call succeeded."""
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self) -> None:
+        """Call failed."""
+        with self.lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+breakers: dict[str, CircuitBreaker] = {}
+breakers_lock = threading.Lock()
+
+
+def get_breaker(lang: str) -> CircuitBreaker:
+    """Get the circuit breaker for a language."""
+    with breakers_lock:
+        if lang not in breakers:
+            breakers[lang] = CircuitBreaker()
+        return breakers[lang]
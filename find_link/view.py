@@ -14,7 +14,6 @@ from flask import (
     redirect,
     render_template,
     request,
-    session,
     url_for,
 )
 from werkzeug.wrappers import Response
@@ -28,9 +27,18 @@ from .api import (
     random_article_list,
     wiki_redirects,
 )
-from .core import do_search, get_case_from_content, get_content_and_timestamp
-from .language import get_current_language, get_langs
-from .match import LinkReplace, NoMatch, find_link_in_content, get_diff
+from .content_store import Article
+from .core import do_search, get_article, get_case_from_content
+from .language import get_current_language, get_langs, set_current_language
+from .match import (
+    LinkReplace,
+    NoMatch,
+    find_link_for_redirects,
+    find_link_in_content,
+    get_diff,
+)
+from .parse_cache import get_parsed
+from .suggest import get_title_index, suggest_links
 from .util import case_flip_first, starts_with_namespace, urlquote, wiki_space_norm
 
 bp = Blueprint("view", __name__)
@@ -44,17 +52,42 @@ def init_app(app: flask.Flask) -> None:
 
 
 def get_page(title: str, q: str, linkto: str | None = None) -> str | None:
-    content, timestamp = get_content_and_timestamp(title)
-    timestamp = "".join(c for c in timestamp if c.isdigit())
-    current_lang = get_current_language()
+    article = get_article(title)
 
     try:
-        (content, replacement, replaced_text) = find_link_in_content(q, content, linkto)
+        (content, replacement, replaced_text) = find_link_in_content(
+            q, article.content, linkto, get_parsed(article)
+        )
     except NoMatch:
         return None
     except LinkReplace:
         return link_replace(title, q, linkto)
 
+    return edit_page(article, content, replacement)
+
+
+def get_redirect_page(title: str, q: str, redirects: list[str]) -> str | None:
+    """Link to q using whichever redirect to q is found first in the article."""
+    article = get_article(title)
+
+    try:
+        (r, edit) = find_link_for_redirects(
+            q, redirects, article.content, get_parsed(article)
+        )
+    except NoMatch:
+        return None
+    except LinkReplace as e:
+        return link_replace(title, e.args[0], q)
+
+    return edit_page(article, edit.content, edit.replacement)
+
+
+def edit_page(article: Article, content: str, replacement: str) -> str:
+    """Page with the edit form for the article with a link added."""
+    title = article.title
+    timestamp = "".join(c for c in article.timestamp if c.isdigit())
+    current_lang = get_current_language()
+
     summary = "link [[%s]] using [[:en:User:Edward/Find link|Find link]]" % replacement
 
     start_time = datetime.now().strftime("%Y%m%d%H%M%S")
@@ -105,7 +138,7 @@ def lang_from_q(q: str) -> str:
     m = re_lang.match(q)
     if not m:
         return q
-    session["current_lang"] = m.group(1)
+    set_current_language(m.group(1))
     return m.group(2)
 
 
@@ -115,7 +148,7 @@ def lang_from_request() -> None:
     valid_languages = {lang["code"] for lang in langs}
     lang_arg = request.args.get("lang")
     if lang_arg and lang_arg.strip().lower() in valid_languages:
-        session["current_lang"] = lang_arg.strip()
+        set_current_language(lang_arg.strip())
 
 
 @bp.route("/<path:q>")
@@ -176,12 +209,22 @@ def findlink(
 
     if redirect_to:
         redirect_to = get_case_from_content(redirect_to)
+    timings: dict[str, float] = {}
     try:
-        ret = do_search(q, redirect_to)
+        ret = do_search(q, redirect_to, timings)
     except MediawikiError as e:
         error = e.args[0]
         return "Mediawiki error: " + html.escape(error)
 
+    flask.current_app.logger.info(
+        "search %r: %s",
+        q,
+        ", ".join(f"{name}={secs:.3f}s" for name, secs in timings.items()),
+    )
+
+    if ret["skipped"] and not message:
+        message = "Wikipedia was slow to respond, some results might be missing"
+
     for doc in ret["results"]:
         doc["snippet"] = Markup(doc["snippet"])
 
@@ -222,6 +265,46 @@ def newpages() -> str:
     return render_template("new_pages.html", new_pages=np)
 
 
+@bp.route("/suggest")
+def suggest() -> Response | str:
+    """Article titles mentioned in an article that could be linked."""
+    title = request.args.get("title")
+    if not title:
+        return redirect(url_for(".index"))
+    title = wiki_space_norm(title)
+    lang_from_request()
+    current_lang = get_current_language()
+    index = get_title_index()
+    if index is None:
+        message = "suggestions are not available, there is no list of titles"
+        return render_template(
+            "suggest.html",
+            title=title,
+            message=message,
+            urlquote=urlquote,
+            current_lang=current_lang,
+        )
+
+    try:
+        article = get_article(title)
+    except MissingPage:
+        return missing_page(title, "")
+    except MediawikiError as e:
+        return "MediaWiki error: " + typing.cast(str, e.args[0])
+
+    suggestions = suggest_links(
+        article.content, index, title=title, table=get_parsed(article), limit=200
+    )
+    return render_template(
+        "suggest.html",
+        title=title,
+        content=article.content,
+        suggestions=suggestions,
+        urlquote=urlquote,
+        current_lang=current_lang,
+    )
+
+
 @bp.route("/find_link/<q>")
 def bad_url(q: str) -> Response | str:
     return findlink(q)
@@ -255,7 +338,7 @@ def missing_page(title: str, q: str, linkto: str | None = None) -> str:
 @bp.route("/set_lang/<code>")
 def set_lang(code: str) -> Response:
     """Update the session with the chosen language."""
-    session["current_lang"] = code
+    set_current_language(code)
     flash("language updated")
     return redirect(url_for(".index", lang=code))
 
@@ -301,10 +384,9 @@ def index() -> Response | str:
             if reply:
                 return reply
             redirects = list(wiki_redirects(q))
-            for r in redirects:
-                reply = get_page(title, r, linkto=q)
-                if reply:
-                    return reply
+            reply = get_redirect_page(title, q, redirects)
+            if reply:
+                return reply
             return findlink(
                 q.replace(" ", "_"), title=title, message=q + " not in " + title
             )
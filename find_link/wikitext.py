@@ -0,0 +1,302 @@
+"""Span-based tokenizer for article wikitext.
+
+The article is scanned once and the result is a table of (kind, start, end)
+spans held in arrays, the text is only sliced when a piece is needed.
+"""
+
+import array
+import bisect
+import functools
+import re
+import threading
+import typing
+
+HEADING, COMMENT, CITE, IMAGE, LINK = range(1, 6)
+
+kind_names = {
+    HEADING: "heading",
+    COMMENT: "comment",
+    CITE: "cite",
+    IMAGE: "image",
+    LINK: "link",
+}
+
+re_heading = re.compile(r"^\s*(=+)\s*(.+)\s*\1(<!--.*-->|\s)*$")
+# same as re_heading, for matching at an offset within the article
+re_heading_at = re.compile(re_heading.pattern[1:])
+
+re_comment = re.compile(r"<!--.*?(?:-->|$)", re.S)
+
+re_cite_or_short_description = re.compile(
+    r"(?:{{Short description|(.*?)}}|<ref( [^>]*?)?>\s*({{cite.*?}}|\[https?://[^]]*?\])\s*</ref>)",
+    re.I | re.S,
+)
+
+re_link_in_text = re.compile(r"\[\[[^]]+?\]\]", re.I | re.S)
+
+# the line boundaries used by str.splitlines
+line_breaks = "\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+re_line_end = re.compile(f"\r\n|[{line_breaks}]")
+# line where the first character that isn't a space is "=", the match starts
+# with the line break before it
+re_heading_candidate = re.compile(f"[{line_breaks}][^\\S{line_breaks}]*=")
+re_comment_open = re.compile("<!--")
+re_comment_close = re.compile("-->")
+
+Span = tuple[int, int, int]  # (kind, start, end)
+Section = tuple[int, int, int]  # (heading start, body start, end)
+
+
+# re.IGNORECASE treats dotted and dotless i as the same letter as i
+fold_i = {ord("\u0130"): "i", ord("\u0131"): "i"}
+
+
+def fold_case(text: str) -> str:
+    """Case fold text the way re.IGNORECASE compares characters."""
+    return text.translate(fold_i).casefold()
+
+
+def is_image_link(text: str, start: int) -> bool:
+    """Link at start is a file or image link."""
+    prefix = text[start + 2 : start + 8].lower()
+    return prefix.startswith("file:") or prefix.startswith("image:")
+
+
+class SpanTable:
+    """Spans found in an article, in order of their start offset.
+
+    Sections are scanned on demand, call scan_to() before looking at the spans
+    of a section. Use tokenize() to get a table with every section scanned.
+    """
+
+    def __init__(self, text: str, index: "SectionIndex") -> None:
+        """Init."""
+        self.text = text
+        self.index = index
+        self.kinds = array.array("B")
+        self.starts = array.array("q")
+        self.ends = array.array("q")
+        self.scanned = 0  # number of sections scanned so far
+        self.scan_lock = threading.Lock()
+        # comments not yet added, in reverse order
+        self.comments = [(m.start(), m.end()) for m in re_comment.finditer(text)]
+        self.comments.reverse()
+
+    def scan_to(self, section_num: int) -> None:
+        """Scan sections up to and including section_num."""
+        if section_num < self.scanned:
+            return
+        with self.scan_lock:
+            while self.scanned <= section_num and self.scanned < len(self.sections):
+                self.scan_section(*self.sections[self.scanned])
+                self.scanned += 1
+            if self.scanned == len(self.sections):
+                while self.comments:
+                    self.add(COMMENT, *self.comments.pop())
+
+    def scan_section(self, heading_start: int, body_start: int, end: int) -> None:
+        """Add the spans found in one section."""
+        if heading_start != body_start:
+            self.add_span(HEADING, heading_start, body_start)
+        prev = body_start
+        for m in re_cite_or_short_description.finditer(self.text, body_start, end):
+            self.add_links(prev, m.start())
+            self.add_span(CITE, m.start(), m.end())
+            prev = m.end()
+        self.add_links(prev, end)
+
+    def add_links(self, start: int, end: int) -> None:
+        """Add the links found between start and end."""
+        text = self.text
+        for m in re_link_in_text.finditer(text, start, end):
+            kind = IMAGE if is_image_link(text, m.start()) else LINK
+            self.add_span(kind, m.start(), m.end())
+
+    def add_span(self, kind: int, start: int, end: int) -> None:
+        """Add a span, and any comments that start before it."""
+        comments = self.comments
+        while comments and comments[-1][0] < start:
+            self.add(COMMENT, *comments.pop())
+        self.add(kind, start, end)
+
+    @property
+    def sections(self) -> list[Section]:
+        """Sections of the article."""
+        return self.index.sections
+
+    @functools.cached_property
+    def folded(self) -> str:
+        """Case folded text with hyphens removed, for the match prefilter."""
+        return fold_case(self.text).replace("-", "")
+
+    def __len__(self) -> int:
+        """Number of spans."""
+        return len(self.kinds)
+
+    def __iter__(self) -> typing.Iterator[Span]:
+        """Iterate through all the spans."""
+        return zip(self.kinds, self.starts, self.ends)
+
+    def add(self, kind: int, start: int, end: int) -> None:
+        """Add a span, it must start at or after the previous one."""
+        # readers don't take the lock, they check len(self.kinds) before
+        # indexing starts and ends, so kinds has to be appended last
+        self.starts.append(start)
+        self.ends.append(end)
+        self.kinds.append(kind)
+
+    def find(
+        self, kind: int, start: int = 0, end: int | None = None
+    ) -> typing.Iterator[tuple[int, int]]:
+        """Spans of a kind that start within the given range."""
+        if end is None:
+            end = len(self.text)
+        i = bisect.bisect_left(self.starts, start)
+        while i < len(self.kinds) and self.starts[i] < end:
+            if self.kinds[i] == kind:
+                yield (self.starts[i], self.ends[i])
+            i += 1
+
+    def chunks(self, start: int, end: int) -> typing.Iterator[tuple[str, int, int]]:
+        """Split a range into text and cite pieces."""
+        prev = start
+        for cite_start, cite_end in self.find(CITE, start, end):
+            yield ("text", prev, cite_start)
+            yield ("cite", cite_start, cite_end)
+            prev = cite_end
+        yield ("text", prev, end)
+
+    def tokens(self, start: int, end: int) -> typing.Iterator[tuple[str, int, int]]:
+        """Split a text chunk into text, link and image pieces."""
+        prev = start
+        i = bisect.bisect_left(self.starts, start)
+        while i < len(self.kinds) and self.starts[i] < end:
+            kind = self.kinds[i]
+            if kind == LINK or kind == IMAGE:
+                if prev != self.starts[i]:
+                    yield ("text", prev, self.starts[i])
+                yield (
+                    "link" if kind == LINK else "image",
+                    self.starts[i],
+                    self.ends[i],
+                )
+                prev = self.ends[i]
+            i += 1
+        if prev < end:
+            yield ("text", prev, end)
+
+    def heading_level(self, section_num: int) -> int:
+        """Heading level of a section, 0 for the lead."""
+        return self.index.levels[section_num]
+
+
+def heading_level(text: str, section: Section) -> int:
+    """Heading level of a section, 0 for the lead."""
+    heading_start, body_start, end = section
+    if heading_start == body_start:
+        return 0
+    m = re_heading_at.match(text, heading_start, body_start)
+    assert m
+    return len(m.group(1))
+
+
+def line_end(text: str, pos: int) -> int:
+    """End of the line containing pos, including the line break."""
+    m = re_line_end.search(text, pos)
+    return m.end() if m else len(text)
+
+
+def comment_state(text: str) -> tuple[list[int], list[bool]]:
+    """Lines that open or close a comment.
+
+    Returns the line ends and whether the text after each line is inside a
+    comment. A line with a "-->" closes the comment, even if it opens another.
+    """
+    closing = {line_end(text, m.start()) for m in re_comment_close.finditer(text)}
+    opening = {line_end(text, m.start()) for m in re_comment_open.finditer(text)}
+    ends = sorted(closing | opening)
+    return (ends, [end not in closing for end in ends])
+
+
+def find_headings(text: str) -> list[tuple[int, int]]:
+    """Heading lines outside of comments, as (start, end) offsets."""
+    headings = []
+    comment_ends, in_comment = comment_state(text)
+    starts = [m.start() + 1 for m in re_heading_candidate.finditer(text)]
+    if text[:1].isspace() or text.startswith("="):
+        starts.insert(0, 0)
+    for start in starts:
+        end = line_end(text, start)
+        i = bisect.bisect_right(comment_ends, end)
+        if i and in_comment[i - 1]:
+            continue
+        if re_heading_at.match(text, start, end):
+            headings.append((start, end))
+    return headings
+
+
+def find_sections(text: str) -> list[Section]:
+    """Split an article into sections.
+
+    The lead is only included when it isn't empty, or there are no headings.
+    """
+    headings = find_headings(text)
+    sections = []
+    if not headings or headings[0][0] > 0:
+        sections.append((0, 0, headings[0][0] if headings else len(text)))
+    for num, (start, end) in enumerate(headings):
+        next_start = headings[num + 1][0] if num + 1 < len(headings) else len(text)
+        sections.append((start, end, next_start))
+    return sections
+
+
+class SectionIndex:
+    """Section offsets, heading levels and nesting of an article."""
+
+    def __init__(self, text: str) -> None:
+        """Init."""
+        self.sections = find_sections(text)
+        self.levels = array.array("q", (heading_level(text, s) for s in self.sections))
+        # parent section number, -1 for top level sections and the lead
+        self.parents = array.array("q")
+        # end of the last subsection of each section
+        self.subsections_end = array.array("q", (end for _, _, end in self.sections))
+        self.children: list[list[int]] = [[] for _ in self.sections]
+
+        stack: list[int] = []  # open sections, the lead is never a parent
+        for num, level in enumerate(self.levels):
+            while stack and self.levels[stack[-1]] >= level:
+                stack.pop()
+            self.parents.append(stack[-1] if stack else -1)
+            if stack:
+                self.children[stack[-1]].append(num)
+            for ancestor in stack:
+                self.subsections_end[ancestor] = self.sections[num][2]
+            if level:
+                stack.append(num)
+
+    def __len__(self) -> int:
+        """Number of sections."""
+        return len(self.sections)
+
+    def section_at(self, offset: int) -> int:
+        """Number of the section containing offset."""
+        starts = [heading_start for heading_start, _, _ in self.sections]
+        return max(bisect.bisect_right(starts, offset) - 1, 0)
+
+    def subsections(self, section_num: int) -> tuple[int, int]:
+        """Offsets of the subsections that follow a section."""
+        if section_num >= len(self.sections):
+            return (0, 0)
+        end = self.sections[section_num][2]
+        return (end, self.subsections_end[section_num])
+
+
+def tokenize(text: str, index: SectionIndex | None = None) -> SpanTable:
+    """Scan an article and build its span table.
+
+    A section index from an earlier scan of the same text can be passed in.
+    """
+    table = SpanTable(text, index if index is not None else SectionIndex(text))
+    table.scan_to(len(table.sections))
+    return table
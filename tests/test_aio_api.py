@@ -0,0 +1,65 @@
+import json
+import unittest
+
+try:
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+except ImportError:  # aiohttp is only needed for the asyncio client
+    raise unittest.SkipTest('aiohttp is not installed')
+import find_link
+from find_link.aio_api import Client
+
+
+class TestAioApi(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.requests = []
+
+        async def handler(request):
+            params = dict(request.query)
+            if request.method == 'POST':
+                params.update(await request.post())
+            self.requests.append(params)
+            if params.get('list') == 'search':
+                reply = {'query': {'searchinfo': {'totalhits': 1},
+                                   'search': [{'title': 'Coaching inn'}]}}
+            elif params.get('prop') == 'info':
+                page = {'title': params['titles'], 'missing': True}
+                reply = {'query': {'pages': [page]}}
+            elif params.get('prop') == 'templates':
+                pages = [{'title': t, 'templates': [{'title': 'Template:Disambig'}]}
+                         for t in params['titles'].split('|') if t.startswith('D')]
+                reply = {'query': {'pages': pages}}
+            elif params.get('list') == 'allpages':
+                reply = {'error': {'info': 'broken'}}
+            else:
+                reply = {}
+            return web.Response(text=json.dumps(reply))
+
+        app = web.Application()
+        app.router.add_route('*', '/w/api.php', handler)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        url = str(self.server.make_url('/w/api.php'))
+        self.client = Client(per_host=2, url_template=url)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.close()
+
+    async def test_wiki_search(self):
+        totalhits, results = await self.client.wiki_search('coaching inn')
+        self.assertEqual(totalhits, 1)
+        self.assertEqual(results[0]['title'], 'Coaching inn')
+        self.assertEqual(self.requests[0]['srsearch'], '"coaching inn"')
+
+    async def test_exceptions(self):
+        with self.assertRaises(find_link.api.MissingPage):
+            await self.client.get_wiki_info('Nowhere')
+        with self.assertRaises(find_link.api.MediawikiError):
+            await self.client.all_pages('test')
+
+    async def test_find_disambig(self):
+        titles = ['D%d' % i for i in range(60)] + ['Other']
+        found = await self.client.find_disambig(titles)
+        self.assertEqual(len(found), 60)
+        self.assertEqual(len(self.requests), 2)
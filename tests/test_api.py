@@ -0,0 +1,13 @@
+import unittest
+import concurrent.futures
+import find_link
+
+
+class TestApi(unittest.TestCase):
+    def test_session_per_language(self):
+        s = find_link.api.get_session('de')
+        adapter = s.get_adapter('https://de.wikipedia.org/w/api.php')
+        self.assertEqual(adapter.max_retries.total, find_link.api.session_config['retries'])
+        with concurrent.futures.ThreadPoolExecutor() as pool:
+            found = set(pool.map(lambda i: id(find_link.api.get_session('de')), range(8)))
+        self.assertEqual(found, {id(s)})
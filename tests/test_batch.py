@@ -0,0 +1,108 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from find_link import batch, cache, ratelimit
+from find_link.api import MissingPage
+from find_link.content_store import Article
+
+articles = {
+    'Sage': 'lead\n== Habitat ==\nfound in coastal sage scrub near the coast\n',
+    'Chaparral': 'nothing to link here\n',
+}
+
+
+def get_article(title):
+    if title not in articles:
+        raise MissingPage(title)
+    return Article(title, 0, '2020-01-01T00:00:00Z', articles[title])
+
+
+def do_search(q, redirect_to):
+    return {'results': [{'title': 'Sage', 'match': 'exact'},
+                        {'title': 'Chaparral', 'match': 'exact'}],
+            'skipped': []}
+
+
+@patch('find_link.batch.get_article', get_article)
+@patch('find_link.batch.do_search', do_search)
+@patch('find_link.batch.get_wiki_info', lambda q: None)
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.input = os.path.join(self.tmp.name, 'jobs.jsonl')
+        self.output = os.path.join(self.tmp.name, 'results.jsonl')
+        with open(self.input, 'w') as f:
+            f.write(json.dumps('coastal sage scrub') + '\n')
+            f.write(json.dumps({'term': 'coastal sage scrub', 'article': 'Missing'}) + '\n')
+            f.write(json.dumps({'term': 'coastal sage scrub', 'article': 'Sage', 'lang': 'de'}) + '\n')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        cache.disable()
+        ratelimit.request_budget = None
+
+    def read_output(self):
+        with open(self.output) as f:
+            return [json.loads(line) for line in f]
+
+    def test_read_jobs(self):
+        jobs = batch.read_jobs(self.input, lang='fr')
+        self.assertEqual([(j.num, j.term, j.article, j.lang) for j in jobs], [
+            (0, 'coastal sage scrub', None, 'fr'),
+            (1, 'coastal sage scrub', 'Missing', 'fr'),
+            (2, 'coastal sage scrub', 'Sage', 'de'),
+        ])
+
+        path = os.path.join(self.tmp.name, 'jobs.csv')
+        with open(path, 'w') as f:
+            f.write('term,article\ncoastal sage scrub,Sage\nchaparral,\n')
+        jobs = batch.read_jobs(path)
+        self.assertEqual([(j.term, j.article) for j in jobs],
+                         [('coastal sage scrub', 'Sage'), ('chaparral', None)])
+
+    def test_run(self):
+        batch.main([self.input, '-o', self.output, '--workers', '2', '--progress-every', '0'])
+        rows = sorted(self.read_output(), key=lambda row: (row['job'], row['article']))
+        self.assertEqual([(row['job'], row['article'], row['status']) for row in rows], [
+            (0, 'Chaparral', 'no_match'),
+            (0, 'Sage', 'ok'),
+            (1, 'Missing', 'missing'),
+            (2, 'Sage', 'ok'),
+        ])
+        ok = rows[1]
+        self.assertEqual(ok['replacement'], 'coastal sage scrub')
+        self.assertEqual(ok['section'], 1)
+        self.assertEqual(ok['match'], 'exact')
+        self.assertEqual(rows[3]['lang'], 'de')
+
+        # a second run has nothing left to do
+        batch.main([self.input, '-o', self.output, '--progress-every', '0'])
+        self.assertEqual(len(self.read_output()), 4)
+
+    def test_resume(self):
+        with open(self.output + '.checkpoint', 'w') as f:
+            f.write('0\n')
+        with open(self.output, 'w') as f:
+            f.write(json.dumps({'job': 0, 'status': 'ok'}) + '\n')
+            f.write(json.dumps({'job': 1, 'status': 'partial'}) + '\n')
+        batch.main([self.input, '-o', self.output, '--progress-every', '0', '--budget', '10'])
+        rows = self.read_output()
+        self.assertEqual(sorted(row['job'] for row in rows), [0, 1, 2])
+        self.assertNotIn('partial', [row['status'] for row in rows])
+        with open(self.output + '.checkpoint') as f:
+            self.assertEqual(sorted(int(line) for line in f), [0, 1, 2])
+
+    def test_incomplete_search_not_checkpointed(self):
+        def incomplete(q, redirect_to):
+            return do_search(q, redirect_to) | {'skipped': ['find_disambig']}
+
+        with patch('find_link.batch.do_search', incomplete):
+            batch.main([self.input, '-o', self.output, '--progress-every', '0'])
+        rows = [row for row in self.read_output() if row['job'] == 0]
+        self.assertEqual([(row['status'], row['error']) for row in rows],
+                         [('error', 'search incomplete: find_disambig')])
+        with open(self.output + '.checkpoint') as f:
+            self.assertEqual(sorted(int(line) for line in f), [1, 2])
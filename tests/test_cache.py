@@ -0,0 +1,60 @@
+import os
+import json
+import tempfile
+import unittest
+import responses
+import find_link
+from find_link import cache
+
+
+class TestCache(unittest.TestCase):
+    def test_make_key(self):
+        a = cache.make_key('en', {'list': 'search', 'srlimit': 50})
+        b = cache.make_key('en', {'srlimit': '50', 'list': 'search'})
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, cache.make_key('de', {'list': 'search', 'srlimit': 50}))
+
+    def test_ttl(self):
+        self.assertEqual(cache.ttl_for({'list': 'random'}), 0)
+        self.assertEqual(cache.ttl_for({'list': 'allpages'}), 24 * 60 * 60)
+        self.assertEqual(cache.ttl_for({'prop': 'unknown'}), cache.default_ttl)
+
+    def test_lru(self):
+        lru = cache.LRUCache(2)
+        lru.set('a', 1, 60)
+        lru.set('b', 2, 60)
+        lru.get('a')
+        lru.set('c', 3, 60)
+        self.assertEqual(lru.get('a'), 1)
+        self.assertIsNone(lru.get('b'))
+        lru.set('d', 4, -1)
+        self.assertIsNone(lru.get('d'))
+
+    def test_disk_tier(self):
+        params = {'list': 'allpages', 'apprefix': 'test'}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = os.path.join(tmpdir, 'cache.sqlite')
+            rc = cache.ResponseCache(db_path=db_path)
+            self.assertIsNone(rc.get('en', params))
+            rc.set('en', params, {'query': {'allpages': []}})
+
+            rc = cache.ResponseCache(db_path=db_path)  # simulate restart
+            self.assertEqual(rc.get('en', params), {'query': {'allpages': []}})
+            self.assertEqual(rc.get('en', params), {'query': {'allpages': []}})
+            stats = rc.stats()
+            self.assertEqual(stats['disk_hit'], 1)
+            self.assertEqual(stats['memory_hit'], 1)
+
+    @responses.activate
+    def test_api_get_uses_cache(self):
+        body = json.dumps({'query': {'allpages': []}})
+        responses.add(responses.GET, 'https://en.wikipedia.org/w/api.php', body=body)
+        rc = cache.configure()
+        try:
+            find_link.api.cat_start('test123')
+            find_link.api.cat_start('test123')
+            self.assertEqual(len(responses.calls), 1)
+            self.assertEqual(rc.stats()['memory_hit'], 1)
+            self.assertEqual(rc.stats()['miss'], 1)
+        finally:
+            cache.disable()
@@ -0,0 +1,54 @@
+import json
+import unittest
+import responses
+import find_link
+from find_link import content_store
+from find_link.content_store import Article, ContentStore
+
+
+def one_page(page):
+    return json.dumps({'query': {'pages': [page]}})
+
+
+class TestContentStore(unittest.TestCase):
+    def test_eviction(self):
+        store = ContentStore(max_bytes=20000, max_article_bytes=15000)
+        store.put('en', Article('A', 1, '', 'a' * 8000))
+        store.put('en', Article('B', 1, '', 'b' * 8000))
+        store.get('en', 'A')
+        store.put('en', Article('C', 1, '', 'c' * 8000))
+        self.assertIsNotNone(store.get('en', 'A'))
+        self.assertIsNone(store.get('en', 'B'))
+        self.assertLessEqual(store.total_bytes, store.max_bytes)
+
+        store.put('en', Article('D', 1, '', 'd' * 16000))
+        self.assertIsNone(store.get('en', 'D'))
+        self.assertEqual(store.stats()['too_big'], 1)
+
+    @responses.activate
+    def test_revision_check(self):
+        url = 'https://en.wikipedia.org/w/api.php'
+        content = one_page({
+            'title': 'Test', 'lastrevid': 10,
+            'revisions': [{'timestamp': '2020-01-01T00:00:00Z', 'content': 'old text'}],
+        })
+        info = one_page({'title': 'Test', 'lastrevid': 10})
+        new_content = one_page({
+            'title': 'Test', 'lastrevid': 11,
+            'revisions': [{'timestamp': '2020-02-01T00:00:00Z', 'content': 'new text'}],
+        })
+        new_info = one_page({'title': 'Test', 'lastrevid': 11})
+        for body in content, info, new_info, new_content:
+            responses.add(responses.GET, url, body=body)
+
+        store = content_store.configure()
+        store.recheck_after = -1
+        try:
+            get = find_link.core.get_content_and_timestamp
+            self.assertEqual(get('Test')[0], 'old text')
+            self.assertEqual(get('Test')[0], 'old text')  # only prop=info
+            self.assertEqual(get('Test')[0], 'new text')  # revision changed
+        finally:
+            content_store.configure()
+        self.assertEqual(len(responses.calls), 4)
+        self.assertIn('prop=info', responses.calls[1].request.url)
@@ -2,11 +2,13 @@
 import os
 import re
 import json
+import random
 import unittest
 import responses
 import find_link
 import urllib.parse
 from unittest.mock import patch
+from find_link.resolver import DictResolver
 
 def wiki_url(params):
     default = {
@@ -257,6 +259,67 @@ class TestFindLink(unittest.TestCase):
         totalhits, results = find_link.api.wiki_search('hedge (finance)')
         self.assertGreater(totalhits, 0)
 
+    @responses.activate
+    def test_wiki_search_parallel(self):
+        def callback(request):
+            params = urllib.parse.parse_qs(urllib.parse.urlparse(request.url).query)
+            offset = int(params.get('sroffset', ['0'])[0])
+            reply = {'query': {
+                'searchinfo': {'totalhits': 120},
+                'search': [{'title': 'Result %d' % i}
+                           for i in range(offset, min(offset + 50, 120))],
+            }}
+            if offset + 50 < 120:
+                reply['continue'] = {'sroffset': offset + 50, 'continue': '-||'}
+            return (200, {}, json.dumps(reply))
+
+        url = 'https://en.wikipedia.org/w/api.php'
+        responses.add_callback(responses.GET, url, callback=callback)
+        for parallel in True, False:
+            totalhits, results = find_link.api.wiki_search('test', parallel=parallel)
+            self.assertEqual(totalhits, 120)
+            self.assertEqual([doc['title'] for doc in results],
+                             ['Result %d' % i for i in range(120)])
+        totalhits, results = find_link.api.wiki_search('test', target=60)
+        self.assertEqual(len(results), 60)
+        self.assertEqual(len(responses.calls), 8)
+
+    @responses.activate
+    def test_iter_backlinks(self):
+        def callback(request):
+            params = urllib.parse.parse_qs(urllib.parse.urlparse(request.url).query)
+            page = int(params.get('blcontinue', ['0'])[0])
+            reply = {'query': {'backlinks': [{'title': 'Page %d' % page}]}}
+            reply['continue'] = {'blcontinue': str(page + 1), 'continue': '-||'}
+            return (200, {}, json.dumps(reply))
+
+        url = 'https://en.wikipedia.org/w/api.php'
+        responses.add_callback(responses.GET, url, callback=callback)
+        for num, doc in enumerate(find_link.api.iter_backlinks('Test')):
+            if num == 2:
+                break
+        self.assertEqual(doc['title'], 'Page 2')
+        self.assertEqual(len(responses.calls), 3)
+
+    @responses.activate
+    def test_links_to(self):
+        body = json_query({
+            'normalized': [{'from': 'foo', 'to': 'Foo'}],
+            'pages': [
+                {'title': 'Foo', 'links': [{'ns': 0, 'title': 'Target'}]},
+                {'title': 'Bar'},
+            ],
+        })
+        url = wiki_url({
+            'prop': 'links',
+            'pllimit': 'max',
+            'titles': 'foo|Bar',
+            'pltitles': 'Target',
+            'continue': '',
+        })
+        responses.add(responses.GET, url, body=body, match_querystring=True)
+        self.assertEqual(find_link.api.links_to(['foo', 'Bar'], ['Target']), {'foo'})
+
     @responses.activate
     def test_do_search(self):
         url = wiki_url({
@@ -340,14 +403,48 @@ class TestFindLink(unittest.TestCase):
 
         responses.add(responses.GET, url, body=body, match_querystring=True)
 
-        reply = find_link.core.do_search('market town', None)
+        timings = {}
+        reply = find_link.core.do_search('market town', None, timings)
+        self.assertIn('wiki_search', timings)
+        self.assertIn('total', timings)
         self.assertIsInstance(reply, dict)
-        self.assertSetEqual(set(reply.keys()), {'totalhits', 'results', 'longer'})
+        self.assertSetEqual(set(reply.keys()), {'totalhits', 'results', 'longer', 'skipped'})
+        self.assertListEqual(reply['skipped'], [])
         self.assertGreater(reply['totalhits'], 0)
         self.assertIsInstance(reply['results'], list)
         self.assertGreater(len(reply['results']), 0)
         self.assertTrue(any(title.startswith('Market towns of') for title in reply['longer']))
 
+    @responses.activate
+    def test_do_search_link_check(self):
+        def callback(request):
+            params = {k: v[0] for k, v in urllib.parse.parse_qs(
+                urllib.parse.urlparse(request.url).query, keep_blank_values=True).items()}
+            if params.get('list') == 'search':
+                search = [{'title': t, 'snippet': 'a tram stop'}
+                          for t in ('Linked', 'Linked via redirect', 'Unlinked')]
+                reply = {'searchinfo': {'totalhits': 3}, 'search': search}
+            elif params.get('list') == 'backlinks' and 'blfilterredir' in params:
+                reply = {'backlinks': [{'title': 'Tram stops', 'redirect': True}]}
+            elif params.get('list') == 'backlinks':
+                self.fail('backlinks downloaded in link check mode')
+            elif params.get('prop') == 'links':
+                self.assertEqual(params['pltitles'], 'tram stop|Tram stops')
+                pages = [{'title': 'Linked', 'links': [{'title': 'Tram stop'}]},
+                         {'title': 'Linked via redirect', 'links': [{'title': 'Tram stops'}]},
+                         {'title': 'Unlinked'}]
+                reply = {'pages': pages}
+            elif params.get('prop') == 'templates':
+                reply = {'pages': [{'title': t} for t in params['titles'].split('|')]}
+            else:
+                reply = {'allpages': [], 'categorymembers': []}
+            return (200, {}, json.dumps({'query': reply}))
+
+        url = 'https://en.wikipedia.org/w/api.php'
+        responses.add_callback(responses.GET, url, callback=callback)
+        reply = find_link.core.do_search('tram stop', None, exclusion='links')
+        self.assertEqual([doc['title'] for doc in reply['results']], ['Unlinked'])
+
     def test_parse_cite(self):
         bindir = os.path.abspath(os.path.dirname(__file__))
         filename = os.path.join(bindir, 'cite_parse_error')
@@ -428,6 +525,109 @@ Paragraph 4.
         m = re.compile('(P)' + l[1:], re.I).match('P' + l2[1:])
         self.assertEqual(find_link.match.match_found(m, l, None), l)
 
+    def test_matcher_cache(self):
+        cache = find_link.match.MatcherCache()
+        with patch('find_link.match.matcher_cache', cache):
+            sample = 'the coastal sage scrub is a plant community'
+            find_link.match.find_link_in_chunk('coastal sage scrub', sample)
+            misses = cache.stats()['miss']
+            for _ in range(2):
+                (c, r, found) = find_link.match.find_link_in_chunk('coastal sage scrub', sample)
+                self.assertEqual(r, 'coastal sage scrub')
+            self.assertEqual(cache.stats()['miss'], misses)
+            self.assertGreater(cache.stats()['hit'], 0)
+
+        cache = find_link.match.MatcherCache(maxsize=2)
+        with patch('find_link.match.matcher_cache', cache):
+            for q in 'foo', 'bar', 'baz':
+                find_link.match.get_link_patterns(q)
+            self.assertEqual(len(cache), 2)
+            self.assertNotIn(('foo', 'link'), cache.entries)
+
+    def test_link_matcher_same_as_patterns(self):
+        def search_each_pattern(q, text):
+            for p in find_link.match.patterns:
+                m = p(q).search(text)
+                if m and m.group(0).count('[[') < 4:
+                    return m
+
+        queries = ['coastal sage scrub', 'two-factor authentication', 'Washington, D.C.',
+                   'fall of the Iron Curtain', 'Ali\u2013Frazier', 'istanbul', 'ab']
+        rng = random.Random(0)
+        for q in queries:
+            pieces = q.split() + [q, q.upper(), ' ', ' ', '-', '[[', ']]', '|', "'", ',',
+                                  '\n', 'x', 's', '\u0130', '\u2013', 'link|']
+            matcher = find_link.match.LinkMatcher(q)
+            for _ in range(300):
+                text = ''.join(rng.choice(pieces) for _ in range(rng.randint(1, 25)))
+                expect = search_each_pattern(q, text)
+                m = matcher.search(text)
+                if expect is None:
+                    self.assertIsNone(m, text)
+                else:
+                    self.assertEqual(m.span(), expect.span(), text)
+                    self.assertEqual(m.re.pattern, expect.re.pattern, text)
+
+        # first match of the higher priority patterns spans too many links
+        q = 'a b c d e'
+        text = '[[a]] [[b]] [[c]] [[d]] [[e]] then [[x|a b c d e]]'
+        m = find_link.match.LinkMatcher(q).search(text)
+        self.assertEqual(m.span(), search_each_pattern(q, text).span())
+        self.assertEqual(m.re.pattern, find_link.match.patterns[3](q).pattern)
+
+    def test_find_link_edit(self):
+        content = ('lead\n== A ==\nsome text<ref>[https://example.org]</ref> and the test phrase here\n'
+                   '== B ==\nanother test phrase\n')
+        chunk_calls = []
+        find_link_in_chunk = find_link.match.find_link_in_chunk
+
+        def count_calls(*args, **kwargs):
+            chunk_calls.append(args[1])
+            return find_link_in_chunk(*args, **kwargs)
+
+        with patch('find_link.match.find_link_in_chunk', count_calls):
+            edit = find_link.match.find_link_edit('test phrase', content)
+        self.assertEqual(chunk_calls, ['lead\n', 'some text', ' and the test phrase here\n'])
+        self.assertEqual(edit.content, content.replace('the test', 'the [[test', 1).replace('phrase here', 'phrase]] here'))
+        self.assertEqual(content[edit.start:edit.old_end], 'test phrase')
+        self.assertEqual(edit.content[edit.start:edit.new_end], '[[test phrase]]')
+        self.assertEqual(edit.excerpt(4), 'the [[test phrase]] her')
+
+    def test_find_link_for_redirects(self):
+        content = ('lead about the sage\n== A ==\nsome text<ref>[https://example.org]</ref> '
+                   'with coastal sage and [[Sage scrubland|sage scrub]] here\n'
+                   '== B ==\nsee also sage-brush and the coastal sage scrub\n')
+        q = 'coastal sage scrub'
+        redirects = ['sagebrush steppe', 'sage scrub', 'coastal sage', 'sage brush']
+        resolver = DictResolver(redirects={'Sage scrubland': None})
+
+        def one_at_a_time(redirects):
+            for r in redirects:
+                try:
+                    return (r, find_link.match.find_link_edit(r, content, linkto=q, resolver=resolver))
+                except find_link.match.NoMatch:
+                    pass
+                except find_link.match.LinkReplace:
+                    return (r, None)
+            raise find_link.match.NoMatch
+
+        for _ in range(20):
+            random.shuffle(redirects)
+            expect = one_at_a_time(redirects)
+            try:
+                (r, edit) = find_link.match.find_link_for_redirects(q, redirects, content,
+                                                                    resolver=resolver)
+            except find_link.match.LinkReplace as e:
+                (r, edit) = (e.args[0], None)
+            self.assertEqual((r, edit), expect)
+
+        self.assertRaises(find_link.match.NoMatch, find_link.match.find_link_for_redirects,
+                          q, ['chaparral'], 'nothing to link here')
+        (r, edit) = find_link.match.find_link_for_redirects(q, ['chaparral', 'sage'], content,
+                                                            resolver=resolver)
+        self.assertEqual(r, 'chaparral')
+        self.assertEqual(edit.replacement, q)
+
     def test_avoid_link_in_heading(self):
         tp = 'test phrase'
         content = '''
@@ -440,7 +640,7 @@ This sentence contains the test phrase.'''
         self.assertEqual(r, tp)
 
     @responses.activate
-    @patch('find_link.match.get_case_from_content', lambda s: None)
+    @patch('find_link.resolver.get_case_from_content', lambda s: None)
     def test_find_link_in_content(self):  # this test is slow
         # orig_get_case_from_content = find_link.core.get_case_from_content
         # find_link.core.get_case_from_content = lambda s: None
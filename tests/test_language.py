@@ -0,0 +1,27 @@
+import json
+import unittest
+import concurrent.futures
+import contextvars
+import responses
+import find_link
+from find_link.language import get_current_language, use_language
+
+
+class TestLanguage(unittest.TestCase):
+    def test_use_language(self):
+        self.assertEqual(get_current_language(), 'en')
+        with use_language('de'):
+            self.assertEqual(get_current_language(), 'de')
+            context = contextvars.copy_context()
+            with concurrent.futures.ThreadPoolExecutor() as pool:
+                lang = pool.submit(context.run, get_current_language).result()
+            self.assertEqual(lang, 'de')
+        self.assertEqual(get_current_language(), 'en')
+
+    @responses.activate
+    def test_lang_argument(self):
+        body = json.dumps({'query': {'allpages': [{'title': 'Kategorie:Test'}]}})
+        responses.add(responses.GET, 'https://de.wikipedia.org/w/api.php', body=body)
+        self.assertEqual(find_link.api.cat_start('Test', lang='de'), ['Kategorie:Test'])
+        with use_language('de'):
+            self.assertEqual(find_link.api.cat_start('Test'), ['Kategorie:Test'])
@@ -0,0 +1,53 @@
+import unittest
+import find_link
+from find_link import content_store, parse_cache
+from find_link.content_store import Article
+
+
+class TestParseCache(unittest.TestCase):
+    def tearDown(self):
+        parse_cache.configure()
+        content_store.configure()
+
+    def test_get_parsed(self):
+        cache = parse_cache.configure(maxsize=2)
+        article = Article('Test', 1, '', 'lead\n== A ==\nthe test phrase\n')
+        table = parse_cache.get_parsed(article, lang='en')
+        self.assertIs(parse_cache.get_parsed(article, lang='en'), table)
+        self.assertIs(table.index, article.sections)
+
+        new_revision = Article('Test', 2, '', 'the test phrase')
+        self.assertIsNot(parse_cache.get_parsed(new_revision, lang='en'), table)
+        parse_cache.get_parsed(Article('Other', 1, '', 'text'), lang='en')
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.stats()['hit'], 1)
+
+        unsaved = Article('Unsaved', 0, '', 'text')
+        parse_cache.get_parsed(unsaved, lang='en')
+        self.assertNotIn(('en', 'Unsaved', 0), cache.tables)
+
+    def test_byte_budget(self):
+        text = 'x' * 10_000
+        size = parse_cache.table_size(parse_cache.SpanTable(text, parse_cache.SectionIndex(text)))
+        cache = parse_cache.configure(max_bytes=size * 8)
+        for revid in range(1, 11):
+            parse_cache.get_parsed(Article('Test', revid, '', text), lang='en')
+        self.assertEqual(len(cache), 8)
+        self.assertEqual(cache.stats()['bytes'], size * 8)
+
+        parse_cache.get_parsed(Article('Big', 1, '', text * 2), lang='en')
+        self.assertEqual(cache.stats()['too_big'], 1)
+
+        content_store.configure(max_article_bytes=len(text) // 2)
+        parse_cache.get_parsed(Article('Refused', 1, '', text), lang='en')
+        self.assertNotIn(('en', 'Refused', 1), cache.tables)
+
+    def test_match_with_table(self):
+        article = Article('Test', 1, '', 'lead\n== A ==\nthe test phrase\n')
+        table = parse_cache.get_parsed(article, lang='en')
+        for _ in range(2):
+            (c, r, found) = find_link.match.find_link_in_content('test phrase', article.content, table=table)
+            self.assertEqual(c, 'lead\n== A ==\nthe [[test phrase]]\n')
+        self.assertEqual(table.folded, 'lead\n== a ==\nthe test phrase\n')
+        with self.assertRaises(find_link.match.NoMatch):
+            find_link.match.find_link_in_content('other phrase', article.content, table=table)
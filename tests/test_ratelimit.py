@@ -0,0 +1,124 @@
+import json
+import time
+import unittest
+import responses
+import find_link
+from find_link import ratelimit, timeouts
+from find_link.ratelimit import HostLimiter
+
+
+class TestRateLimit(unittest.TestCase):
+    def tearDown(self):
+        ratelimit.limiters.clear()
+        timeouts.breakers.clear()
+
+    def half_open_breaker(self):
+        breaker = timeouts.get_breaker('en')
+        breaker.opened_at = time.monotonic() - breaker.reset_after
+        return breaker
+
+    def test_token_bucket(self):
+        limiter = HostLimiter(rate=100, burst=2, start_concurrency=10)
+        self.assertEqual(limiter.try_acquire(), 0)
+        self.assertEqual(limiter.try_acquire(), 0)
+        wait = limiter.try_acquire()
+        self.assertGreater(wait, 0)
+        self.assertLessEqual(wait, 0.01)
+        self.assertTrue(limiter.acquire(timeout=1))
+        self.assertEqual(limiter.state()['in_flight'], 3)
+
+    def test_concurrency(self):
+        limiter = HostLimiter(rate=1000, burst=10, start_concurrency=1)
+        self.assertTrue(limiter.acquire(timeout=0.1))
+        self.assertFalse(limiter.acquire(timeout=0.05))
+        self.assertEqual(limiter.state()['counts'], {'timeout': 1})
+        limiter.release(0.1)
+        self.assertEqual(limiter.state()['concurrency'], 2)
+        self.assertTrue(limiter.acquire(timeout=0.1))
+
+    def test_backoff(self):
+        limiter = HostLimiter(start_concurrency=8)
+        limiter.acquire()
+        limiter.release(0.1, 'throttled', retry_after=0.05)
+        state = limiter.state()
+        self.assertEqual(state['concurrency'], 4)
+        self.assertGreater(state['paused_for'], 0)
+        self.assertGreater(limiter.try_acquire(), 0)
+        time.sleep(0.06)
+        self.assertEqual(limiter.try_acquire(), 0)
+        limiter.release(10.0)  # slow reply
+        self.assertEqual(limiter.state()['concurrency'], 3.6)
+
+    @responses.activate
+    def test_maxlag_retry(self):
+        url = 'https://en.wikipedia.org/w/api.php'
+        maxlag = {'error': {'code': 'maxlag', 'info': 'Waiting for a database server'}}
+        responses.add(responses.GET, url, body=json.dumps(maxlag),
+                      headers={'MediaWiki-API-Error': 'maxlag', 'Retry-After': '0'})
+        responses.add(responses.GET, url, body=json.dumps({'query': {'random': []}}))
+
+        ratelimit.maxlag = 5
+        try:
+            reply = find_link.api.api_get({'list': 'random'})
+        finally:
+            ratelimit.maxlag = None
+        self.assertEqual(reply, {'query': {'random': []}})
+        self.assertEqual(len(responses.calls), 2)
+        self.assertIn('maxlag=5', responses.calls[0].request.url)
+        state = ratelimit.limiter_state()['en']
+        self.assertEqual(state['counts'], {'throttled': 1, 'ok': 1})
+
+    @responses.activate
+    def test_request_budget(self):
+        url = 'https://en.wikipedia.org/w/api.php'
+        responses.add(responses.GET, url, body=json.dumps({'query': {'random': []}}))
+
+        ratelimit.request_budget = ratelimit.RequestBudget(1)
+        try:
+            find_link.api.api_get({'list': 'random'}, use_cache=False)
+            self.assertRaises(find_link.api.BudgetExhausted, find_link.api.api_get,
+                              {'list': 'random', 'rnlimit': 2}, use_cache=False)
+            self.assertEqual(ratelimit.request_budget.used(), {'en': 1})
+            breaker = self.half_open_breaker()
+            self.assertRaises(find_link.api.BudgetExhausted, find_link.api.send,
+                              'GET', 'en', params={'list': 'random'})
+            self.assertFalse(breaker.trial_running)
+        finally:
+            ratelimit.request_budget = None
+        self.assertEqual(len(responses.calls), 1)
+
+    def test_limiter_timeout_releases_trial(self):
+        breaker = self.half_open_breaker()
+        limiter = ratelimit.get_limiter('en')
+        limiter.paused_until = time.monotonic() + 10
+        with timeouts.deadline(0.05):
+            self.assertRaises(find_link.api.DeadlineExceeded, find_link.api.api_get,
+                              {'list': 'random'}, use_cache=False)
+        self.assertEqual(breaker.state, 'half-open')
+        self.assertTrue(breaker.allow())
+
+    @responses.activate
+    def test_still_throttled_closes_breaker(self):
+        url = 'https://en.wikipedia.org/w/api.php'
+        responses.add(responses.GET, url, status=429, body='{}',
+                      headers={'Retry-After': '0'})
+        breaker = self.half_open_breaker()
+        find_link.api.send('GET', 'en', params={'list': 'random'})
+        self.assertEqual(len(responses.calls), ratelimit.throttle_retries + 1)
+        self.assertEqual(breaker.state, 'closed')
+
+    @responses.activate
+    def test_budget_counts_retries(self):
+        url = 'https://en.wikipedia.org/w/api.php'
+        responses.add(responses.GET, url, status=502, body='{}')
+        responses.add(responses.GET, url, status=502, body='{}')
+        responses.add(responses.GET, url, body=json.dumps({'query': {}}))
+
+        ratelimit.request_budget = ratelimit.RequestBudget(2)
+        try:
+            r = find_link.api.send('GET', 'en', params={'list': 'random'})
+            self.assertEqual(ratelimit.request_budget.used(), {'en': 2})
+        finally:
+            ratelimit.request_budget = None
+        self.assertEqual(r.status_code, 502)
+        self.assertEqual(len(responses.calls), 2)
@@ -0,0 +1,89 @@
+import json
+import unittest
+from unittest.mock import patch
+
+import responses
+
+import find_link
+from find_link import cache, redirect_cache
+from find_link.api import MissingPage, MultipleRedirects
+
+
+def info_reply(redirects=(), missing=False):
+    return {'query': {
+        'redirects': list(redirects),
+        'pages': [{'title': 'Page', 'missing': True} if missing else {'title': 'Page'}],
+    }}
+
+
+class TestRedirectCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = redirect_cache.configure()
+
+    def tearDown(self):
+        redirect_cache.configure()
+
+    def test_expiry(self):
+        self.cache.put('en', 'Gone', redirect_cache.MISSING)
+        self.cache.put('en', 'Short', redirect_cache.REDIRECT, 'Long title')
+        self.assertEqual(self.cache.get('en', 'Short'), (redirect_cache.REDIRECT, 'Long title'))
+        self.assertIsNone(self.cache.get('de', 'Short'))
+
+        now = redirect_cache.time.time()
+        with patch('find_link.redirect_cache.time.time', lambda: now + 2 * 60 * 60):
+            self.assertIsNone(self.cache.get('en', 'Gone'))
+            self.assertIsNotNone(self.cache.get('en', 'Short'))
+
+    def test_invalidate(self):
+        self.cache.put('en', 'Short', redirect_cache.REDIRECT, 'Long title')
+        self.cache.put('en', 'Other', redirect_cache.REDIRECT, 'Long title')
+        self.cache.put('en', 'Long title', redirect_cache.NOT_REDIRECT)
+        self.cache.put('en', 'Unrelated', redirect_cache.NOT_REDIRECT)
+        redirect_cache.invalidate('en', 'Long title')
+        self.assertEqual(list(self.cache.entries), [('en', 'Unrelated')])
+        self.assertEqual(dict(self.cache.redirects_to), {})
+
+    @responses.activate
+    def test_invalidate_with_response_cache(self):
+        url = 'https://en.wikipedia.org/w/api.php'
+        redirect = info_reply(redirects=[{'from': 'Page', 'to': 'Old target'}])
+        responses.add(responses.GET, url, body=json.dumps(redirect))
+        responses.add(responses.GET, url, body=json.dumps(info_reply()))
+        cache.configure()
+        try:
+            self.assertEqual(find_link.api.get_wiki_info('Page'), 'Old target')
+            redirect_cache.invalidate('en', 'Page')
+            self.assertIsNone(find_link.api.get_wiki_info('Page'))
+        finally:
+            cache.disable()
+        self.assertEqual(len(responses.calls), 2)
+
+    def test_eviction(self):
+        cache = redirect_cache.configure(maxsize=2)
+        for title in 'A', 'B', 'C':
+            cache.put('en', title, redirect_cache.REDIRECT, 'Target')
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.redirects_to[('en', 'Target')], {'B', 'C'})
+
+    def test_get_wiki_info_cached(self):
+        with patch('find_link.api.api_get', return_value=info_reply(missing=True)) as api_get:
+            for _ in range(2):
+                self.assertRaises(MissingPage, find_link.api.get_wiki_info, 'Page', lang='en')
+        api_get.assert_called_once()
+
+        reply = info_reply([{'from': 'A', 'to': 'B'}, {'from': 'B', 'to': 'Page'}])
+        with patch('find_link.api.api_get', return_value=reply) as api_get:
+            for _ in range(2):
+                self.assertRaises(MultipleRedirects, find_link.api.get_wiki_info, 'A', lang='en')
+        api_get.assert_called_once()
+
+    def test_redirect_map_uses_cache(self):
+        self.cache.put('en', 'Known', redirect_cache.REDIRECT, 'Target')
+        self.cache.put('en', 'Gone', redirect_cache.MISSING)
+        reply = {'query': {'pages': [{'title': 'New'}]}}
+        with patch('find_link.api.api_get', return_value=reply) as api_get:
+            (redirects, missing) = find_link.api.get_redirect_map(['Known', 'Gone', 'New'], lang='en')
+        self.assertEqual(api_get.call_args[0][0]['titles'], 'New')
+        self.assertEqual(redirects, {'Known': 'Target', 'New': None})
+        self.assertEqual(missing, {'Gone'})
+        self.assertEqual(self.cache.get('en', 'New'), (redirect_cache.NOT_REDIRECT, None))
@@ -0,0 +1,92 @@
+import unittest
+from unittest.mock import patch
+
+import find_link
+from find_link import match, redirect_cache
+from find_link.language import get_current_language
+from find_link.api import MissingPage
+from find_link.resolver import DictResolver
+
+
+class TestResolver(unittest.TestCase):
+    def setUp(self):
+        redirect_cache.configure()
+
+    def test_dict_resolver(self):
+        fallback = DictResolver(redirects={'Other': 'Target'})
+        resolver = DictResolver(redirects={'Known': None},
+                                cases={'coastal sage scrub': None},
+                                missing={'Gone'},
+                                fallback=fallback)
+        self.assertIsNone(resolver.get_redirect('Known'))
+        self.assertEqual(resolver.get_redirect('Other'), 'Target')
+        self.assertIsNone(resolver.get_redirect('Unknown'))
+        self.assertRaises(MissingPage, resolver.get_redirect, 'Gone')
+        self.assertIsNone(resolver.get_case('coastal sage scrub'))
+
+    @patch('find_link.api.api_get')
+    def test_match_without_network(self, api_get):
+        q = 'test phrase'
+        sample = 'the [[Phrases used in tests|test phrase]] here'
+        resolver = DictResolver(redirects={'Phrases used in tests': 'Test phrase'})
+        (c, r, found) = match.find_link_in_chunk(q, sample, resolver=resolver)
+        self.assertEqual(c, 'the [[test phrase]] here')
+        self.assertEqual(r, 'test phrase')
+
+        resolver = DictResolver(missing={'Phrases used in tests'})
+        self.assertRaises(match.LinkReplace, match.find_link_in_chunk, q, sample,
+                          resolver=resolver)
+
+        content = 'Test Phrase in title case.'
+        resolver = DictResolver(cases={q: 'Test phrase'})
+        (c, r, found) = match.find_link_in_content(q, content, resolver=resolver)
+        self.assertEqual(c, '[[Test phrase]] in title case.')
+        api_get.assert_not_called()
+
+    def test_api_resolver_language(self):
+        def get_case(title):
+            return get_current_language()
+
+        resolver = find_link.resolver.APIResolver(lang='de')
+        with patch('find_link.resolver.get_case_from_content', get_case):
+            self.assertEqual(resolver.get_case('Test'), 'de')
+            self.assertEqual(find_link.resolver.APIResolver().get_case('Test'), 'en')
+
+    def test_get_redirect_map(self):
+        reply = {'query': {
+            'normalized': [{'from': 'lower case', 'to': 'Lower case'}],
+            'redirects': [{'from': 'Lower case', 'to': 'Target'},
+                          {'from': 'Double', 'to': 'Lower case'}],
+            'interwiki': [{'title': 'fr:Page', 'iw': 'fr'}],
+            'pages': [{'title': 'Target', 'pageid': 1},
+                      {'title': 'Plain', 'pageid': 2},
+                      {'title': 'Gone', 'missing': True}],
+        }}
+        with patch('find_link.api.api_get', return_value=reply) as api_get:
+            (redirects, missing) = find_link.api.get_redirect_map(
+                ['lower case', 'Plain', 'Gone', 'fr:Page', 'Double', 'Plain'])
+        self.assertEqual(redirects, {'lower case': 'Target', 'Plain': None, 'fr:Page': None})
+        self.assertEqual(missing, {'Gone'})
+        api_get.assert_called_once()
+
+    def test_redirects_looked_up_in_batches(self):
+        q = 'test phrase'
+        links = ['[[Phrases used in tests %d|test phrase]]' % i for i in range(120)]
+        content = '\n'.join(links) + '\n[[Phrase redirect|test phrase]]\n'
+        calls = []
+
+        def api_get(params, use_cache=True, lang=None):
+            titles = params['titles'].split('|')
+            calls.append(titles)
+            redirects = [{'from': t, 'to': 'Test phrase'}
+                         for t in titles if t == 'Phrase redirect']
+            pages = [{'title': t, 'pageid': 1} for t in titles if t != 'Phrase redirect']
+            if redirects:
+                pages.append({'title': 'Test phrase', 'pageid': 2})
+            return {'query': {'redirects': redirects, 'pages': pages}}
+
+        with patch('find_link.api.api_get', api_get):
+            (c, r, found) = match.find_link_in_content(q, content)
+        self.assertEqual(r, 'test phrase')
+        self.assertTrue(c.endswith('\n[[test phrase]]\n'))
+        self.assertEqual([len(titles) for titles in calls], [50, 50, 21])
@@ -0,0 +1,143 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+import concurrent.futures
+import responses
+import find_link
+from find_link import singleflight, timeouts
+from find_link.api import DeadlineExceeded
+from find_link.singleflight import Group
+
+
+class TestSingleflight(unittest.TestCase):
+    def test_group(self):
+        group = Group()
+        calls = []
+        release = threading.Event()
+
+        def slow():
+            calls.append(1)
+            release.wait(5)
+            return 'value'
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(group.do, 'key', slow) for _ in range(4)]
+            while group.counts['shared'] + group.counts['leader'] < 4:
+                time.sleep(0.01)
+            release.set()
+            results = [f.result() for f in futures]
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(shared for value, shared in results),
+                         [False, True, True, True])
+        self.assertEqual({value for value, shared in results}, {'value'})
+        self.assertEqual(group.calls, {})
+
+    def test_error_not_kept(self):
+        group = Group()
+        with self.assertRaises(ValueError):
+            group.do('key', lambda: int('x'))
+        self.assertEqual(group.do('key', lambda: 1), (1, False))
+
+    def run_follower(self, group, leader_func, follower_func, seconds):
+        started = threading.Event()
+
+        def leader():
+            started.set()
+            return leader_func()
+
+        def follower():
+            started.wait(5)
+            time.sleep(0.05)
+            with timeouts.deadline(seconds):
+                return group.do('key', follower_func)
+
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        leader_future = pool.submit(group.do, 'key', leader)
+        follower_result = pool.submit(follower).result()
+        pool.shutdown(wait=False)
+        return (leader_future, follower_result)
+
+    def test_follower_gives_up_at_deadline(self):
+        group = Group()
+        release = threading.Event()
+        (leader, result) = self.run_follower(
+            group, lambda: release.wait(5) and 'leader', lambda: 'follower', 0.1)
+        self.assertEqual(result, ('follower', False))
+        self.assertEqual(group.counts['gave_up'], 1)
+        release.set()
+        self.assertEqual(leader.result(), ('leader', False))
+
+    def test_error_is_shared(self):
+        group = Group()
+
+        def fails():
+            time.sleep(0.1)
+            raise ValueError('leader failed')
+
+        follower_calls = []
+        with self.assertRaises(ValueError):
+            self.run_follower(group, fails, lambda: follower_calls.append(1), 5)
+        self.assertEqual(follower_calls, [])
+        self.assertEqual(group.counts['shared'], 1)
+
+    def test_leader_deadline_not_shared(self):
+        group = Group(retry_on=(DeadlineExceeded,))
+
+        def out_of_time():
+            time.sleep(0.1)
+            raise DeadlineExceeded('leader ran out of time')
+
+        (leader, result) = self.run_follower(group, out_of_time, lambda: 'follower', 5)
+        self.assertEqual(result, ('follower', False))
+        self.assertEqual(group.counts['retried'], 1)
+        self.assertRaises(DeadlineExceeded, leader.result)
+
+    def test_lock_files_are_striped(self):
+        with tempfile.TemporaryDirectory() as lock_dir:
+            singleflight.configure_lock_dir(lock_dir)
+            try:
+                for i in range(singleflight.lock_stripes * 2):
+                    with singleflight.process_lock('key %d' % i):
+                        pass
+                self.assertLessEqual(len(os.listdir(lock_dir)),
+                                     singleflight.lock_stripes)
+            finally:
+                singleflight.configure_lock_dir(None)
+
+    def test_lock_wait_limited_by_deadline(self):
+        with tempfile.TemporaryDirectory() as lock_dir:
+            singleflight.configure_lock_dir(lock_dir)
+            try:
+                with open(singleflight.lock_path('key'), 'a') as f:
+                    singleflight.fcntl.flock(f, singleflight.fcntl.LOCK_EX)
+                    ran = []
+
+                    def other_process():
+                        with timeouts.deadline(0.1):
+                            with singleflight.process_lock('key'):
+                                ran.append(1)
+
+                    # flock locks belong to the open file, a second open
+                    # of the same file waits like another process would
+                    start = time.monotonic()
+                    other_process()
+                    self.assertEqual(ran, [1])
+                    self.assertLess(time.monotonic() - start, 2)
+            finally:
+                singleflight.configure_lock_dir(None)
+
+    @responses.activate
+    def test_api_get(self):
+        def callback(request):
+            time.sleep(0.2)
+            return (200, {}, json.dumps({'query': {'allpages': [{'title': 'A'}]}}))
+
+        url = 'https://en.wikipedia.org/w/api.php'
+        responses.add_callback(responses.GET, url, callback=callback)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as pool:
+            replies = list(pool.map(lambda i: find_link.api.all_pages('A'), range(4)))
+        self.assertEqual(replies, [[]] * 4)
+        self.assertEqual(len(responses.calls), 1)
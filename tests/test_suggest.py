@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+
+from unittest.mock import patch
+
+import flask
+
+import find_link
+from find_link import language, suggest
+from find_link.api import HostUnavailable
+from find_link.resolver import DictResolver
+
+sample = '''The [[coastal sage scrub]] grows near the Pacific Ocean.
+== Climate ==
+A Mediterranean climate<ref>[https://example.org Pacific Ocean climate]</ref> with dry summers.
+The Pacific Ocean again, and the [[Santa Ana winds|Santa Ana]] winds.
+'''
+
+
+class TestSuggest(unittest.TestCase):
+    def test_title_index(self):
+        index = suggest.TitleIndex(['Pacific_Ocean', 'Pacific ocean', 'Ocean',
+                                    'Category:Pacific Ocean', 'Santa Ana winds'],
+                                   min_words=2)
+        self.assertEqual(len(index), 2)
+        self.assertEqual(list(index.find('the Pacific-Ocean')),
+                         [('pacific ocean', 'Pacific Ocean')])
+        self.assertEqual(index.max_words, {'pacific': 2, 'santa': 3})
+
+    def test_titles_with_numbers(self):
+        index = suggest.TitleIndex(['1990 FIFA World Cup', '2002 FIFA World Cup',
+                                    'FIFA World Cup', 'Boeing 747', 'Apollo 11'],
+                                   min_words=2)
+        self.assertEqual(len(index), 5)
+        content = 'Flew a Boeing 747 to watch the FIFA World Cup.\n'
+        found = suggest.suggest_links(content, index, resolver=DictResolver())
+        self.assertEqual([s.title for s in found], ['Boeing 747', 'FIFA World Cup'])
+
+    def test_suggest_links(self):
+        index = suggest.TitleIndex(['Pacific Ocean', 'Mediterranean climate', 'Dry summers',
+                                    'Coastal sage scrub', 'Santa Ana winds', 'Sage scrub'])
+        found = suggest.suggest_links(sample, index, title='Sage scrub',
+                                      resolver=DictResolver())
+        self.assertEqual([s.title for s in found],
+                         ['Pacific Ocean', 'Mediterranean climate', 'Dry summers'])
+        first = found[0]
+        self.assertEqual(sample[first.start:first.end], 'Pacific Ocean')
+        self.assertEqual(first.new_text, '[[Pacific Ocean]]')
+
+        self.assertEqual(len(suggest.suggest_links(sample, index, limit=1,
+                                                   resolver=DictResolver())), 1)
+
+    def test_no_lookups_for_title_case(self):
+        class Unavailable:
+            def get_redirect(self, title):
+                raise HostUnavailable(title)
+
+            def get_case(self, title):
+                raise AssertionError('article downloaded for ' + title)
+
+            def prefetch_redirects(self, titles):
+                pass
+
+        content = 'The Coastal Sage Scrub and the [[Winds of Santa Ana|Santa Ana winds]] blow.\n'
+        index = suggest.TitleIndex(['Coastal sage scrub', 'Santa Ana winds'])
+        found = suggest.suggest_links(content, index, resolver=Unavailable())
+        self.assertEqual([(s.title, s.new_text) for s in found],
+                         [('Coastal sage scrub', '[[Coastal sage scrub]]')])
+
+    def test_redirects_looked_up_together(self):
+        content = ('[[Rapid transit in Paris|Paris Metro]], '
+                   + '[[Underground railways of London|London Underground]] and '
+                   + '[[Subway systems in New York|New York City Subway]].\n')
+        index = suggest.TitleIndex(['Paris Metro', 'London Underground',
+                                    'New York City Subway'])
+        calls = []
+
+        def api_get(params, use_cache=True, lang=None):
+            titles = params['titles'].split('|')
+            calls.append(titles)
+            return {'query': {'pages': [{'title': t, 'pageid': 1} for t in titles]}}
+
+        with patch('find_link.api.api_get', api_get):
+            found = suggest.suggest_links(content, index)
+        self.assertEqual(found, [])
+        self.assertEqual([len(titles) for titles in calls], [3])
+
+    def test_missing_titles_file(self):
+        suggest.configure('/nonexistent/titles')
+        try:
+            self.assertIsNone(suggest.get_title_index())
+        finally:
+            suggest.configure(None)
+
+    def test_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'titles')
+            with open(path, 'w') as f:
+                f.write('Pacific_Ocean\nDry summers\n')
+            suggest.configure(path)
+            try:
+                index = suggest.get_title_index()
+                self.assertIs(suggest.get_title_index(), index)
+                self.assertEqual(sorted(index.titles.values()), ['Dry summers', 'Pacific Ocean'])
+            finally:
+                suggest.configure(None)
+        self.assertIsNone(suggest.get_title_index())
+
+    def test_page_without_title_index(self):
+        suggest.configure(None)
+        app = flask.Flask('find_link')
+        language.init_app(app)
+        find_link.view.init_app(app)
+        rv = app.test_client().get('/suggest?title=Coastal+sage+scrub')
+        self.assertEqual(rv.status_code, 200)
+        self.assertIn(b'there is no list of titles', rv.data)
+        self.assertIn(b'wiki/Coastal_sage_scrub', rv.data)
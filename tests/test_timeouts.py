@@ -0,0 +1,97 @@
+import json
+import time
+import unittest
+import requests
+import responses
+import find_link
+from find_link import timeouts
+from find_link.timeouts import CircuitBreaker
+
+
+class TestTimeouts(unittest.TestCase):
+    def tearDown(self):
+        timeouts.breakers.clear()
+
+    def test_circuit_breaker(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_after=0.05)
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'closed')
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        self.assertFalse(breaker.allow())
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())  # trial call
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_trial_released_without_outcome(self):
+        breaker = timeouts.get_breaker('en')
+        breaker.opened_at = time.monotonic() - breaker.reset_after
+        with timeouts.deadline(-1):
+            with self.assertRaises(find_link.api.DeadlineExceeded):
+                find_link.api.api_get({'list': 'random'})
+        self.assertEqual(breaker.state, 'half-open')
+        self.assertFalse(breaker.trial_running)
+        self.assertTrue(breaker.allow())
+
+    @responses.activate
+    def test_deadline_timeout_not_a_failure(self):
+        url = 'https://en.wikipedia.org/w/api.php'
+        responses.add(responses.GET, url, body=requests.Timeout('slow'))
+        breaker = timeouts.get_breaker('en')
+        with timeouts.deadline(5):
+            with self.assertRaises(find_link.api.HostUnavailable):
+                find_link.api.api_get({'list': 'random'})
+        self.assertEqual(breaker.failures, 0)
+
+    def test_no_urllib3_retries_with_deadline(self):
+        retry = find_link.api.DeadlineRetry(total=3)
+        error = ConnectionError('down')
+        self.assertEqual(retry.increment(error=error).total, 2)
+        with timeouts.deadline(10):
+            with self.assertRaises(ConnectionError):
+                retry.increment(error=error)
+
+    def test_deadline(self):
+        self.assertIsNone(timeouts.remaining())
+        with timeouts.deadline(10):
+            connect, read = timeouts.call_timeout()
+            self.assertLessEqual(read, 10)
+            with timeouts.deadline(-1):
+                self.assertIsNone(timeouts.call_timeout())
+                with self.assertRaises(find_link.api.DeadlineExceeded):
+                    find_link.api.api_get({'list': 'random'})
+        self.assertIsNone(timeouts.remaining())
+
+    @responses.activate
+    def test_host_unavailable(self):
+        url = 'https://en.wikipedia.org/w/api.php'
+        responses.add(responses.GET, url, body=requests.ConnectionError('down'))
+        breaker = timeouts.get_breaker('en')
+        for _ in range(breaker.failure_threshold):
+            with self.assertRaises(find_link.api.HostUnavailable):
+                find_link.api.api_get({'list': 'random'})
+        self.assertEqual(breaker.state, 'open')
+        with self.assertRaises(find_link.api.HostUnavailable):
+            find_link.api.api_get({'list': 'random'})
+        self.assertEqual(len(responses.calls), breaker.failure_threshold)
+
+    @responses.activate
+    def test_do_search_partial(self):
+        def callback(request):
+            if 'prop=templates' in request.url:
+                raise requests.Timeout('slow')
+            if 'list=search' in request.url:
+                reply = {'searchinfo': {'totalhits': 1},
+                         'search': [{'title': 'Some article', 'snippet': 'a test'}]}
+            else:
+                reply = {'backlinks': [], 'allpages': [], 'categorymembers': []}
+            return (200, {}, json.dumps({'query': reply}))
+
+        url = 'https://en.wikipedia.org/w/api.php'
+        responses.add_callback(responses.GET, url, callback=callback)
+        reply = find_link.core.do_search('test', None)
+        self.assertEqual(reply['skipped'], ['find_disambig'])
+        self.assertEqual(len(reply['results']), 1)
@@ -0,0 +1,83 @@
+import unittest
+from unittest.mock import patch
+import find_link
+from find_link import wikitext
+from find_link.content_store import Article
+
+
+sample = '''Lead with a [[link]].<!-- note -->
+== First ==
+Text<ref>[https://example.org A]</ref> and [[File:A.jpg|thumb|caption]].
+<!--
+== Commented out ==
+-->
+=== Sub ===
+[[a|b]] end
+'''
+
+
+class TestWikitext(unittest.TestCase):
+    def test_tokenize(self):
+        table = wikitext.tokenize(sample)
+        spans = [(wikitext.kind_names[kind], sample[start:end])
+                 for kind, start, end in table]
+        self.assertEqual(spans, [
+            ('link', '[[link]]'),
+            ('comment', '<!-- note -->'),
+            ('heading', '== First ==\n'),
+            ('cite', '<ref>[https://example.org A]</ref>'),
+            ('image', '[[File:A.jpg|thumb|caption]]'),
+            ('comment', '<!--\n== Commented out ==\n-->'),
+            ('heading', '=== Sub ===\n'),
+            ('link', '[[a|b]]'),
+        ])
+        self.assertEqual(len(table.sections), 3)
+        self.assertEqual([table.heading_level(i) for i in range(3)], [0, 2, 3])
+
+    def test_chunks_and_tokens(self):
+        table = wikitext.tokenize(sample)
+        heading_start, body_start, end = table.sections[1]
+        chunks = [(kind, sample[s:e]) for kind, s, e in table.chunks(body_start, end)]
+        self.assertEqual([kind for kind, text in chunks], ['text', 'cite', 'text'])
+        self.assertEqual(chunks[0][1], 'Text')
+
+        start = body_start + len('Text<ref>[https://example.org A]</ref>')
+        tokens = [(kind, sample[s:e]) for kind, s, e in table.tokens(start, end)]
+        self.assertEqual(tokens[1], ('image', '[[File:A.jpg|thumb|caption]]'))
+        self.assertEqual(''.join(text for kind, text in tokens), sample[start:end])
+
+    def test_line_breaks(self):
+        text = 'lead\r\n== A ==\r\nbody\u2028== B ==\u2028end'
+        table = wikitext.tokenize(text)
+        self.assertEqual([text[h:b] for h, b, e in table.sections],
+                         ['', '== A ==\r\n', '== B ==\u2028'])
+        self.assertEqual(wikitext.find_sections(''), [(0, 0, 0)])
+
+    def test_section_index(self):
+        text = ('lead\n== A ==\na\n=== A1 ===\n==== A1a ====\n=== A2 ===\n'
+                '== B ==\nb\n=== B1 ===\n')
+        index = wikitext.SectionIndex(text)
+        self.assertEqual(list(index.levels), [0, 2, 3, 4, 3, 2, 3])
+        self.assertEqual(list(index.parents), [-1, -1, 1, 2, 1, -1, 5])
+        self.assertEqual(index.children[1], [2, 4])
+        start, end = index.subsections(1)
+        self.assertEqual(text[start:end], '=== A1 ===\n==== A1a ====\n=== A2 ===\n')
+        self.assertEqual(index.subsections(0), (5, 5))
+        self.assertEqual(index.subsections(10), (0, 0))
+
+    def test_get_diff_reuses_index(self):
+        text = 'lead\n== A ==\nthe test phrase\n=== A1 ===\nmore\n== B ==\n'
+        article = Article('Test', 1, '', text)
+        sent = []
+
+        def call_get_diff(title, section_num, section_text):
+            sent.append((section_num, section_text))
+            return 'diff'
+
+        with patch('find_link.match.get_article', lambda title: article), \
+                patch('find_link.match.call_get_diff', call_get_diff):
+            find_link.match.get_diff('test phrase', 'Test', None)
+            index = article.sections
+            find_link.match.get_diff('test phrase', 'Test', None)
+        self.assertIs(article.sections, index)
+        self.assertEqual(sent[0], (1, '== A ==\nthe [[test phrase]]\n=== A1 ===\nmore\n'))